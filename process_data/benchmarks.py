@@ -0,0 +1,1418 @@
+# Benchmarks for the faster code paths, checked against the original
+# implementations on synthetic data so they can run without the real data set.
+# Run from this folder, e.g. `python benchmarks.py ranges --rows 200000`.
+import argparse
+import csv
+import contextlib
+import gzip
+import io
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from unidecode import unidecode
+
+import crosswalk
+import downloader
+import handoff
+import instrument
+import name_matching
+import normalize
+import parse_cache
+import parse_pfds
+import pfd_extract
+from dime import corrections, csv_to_sqlite, features
+
+# The dime/ scripts import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "dime"))
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Call fn and return its result along with the wall time it took, in seconds.
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(name: str, old_seconds: float, new_seconds: float, rows: int):
+    print(
+        "{0}: {1} rows, old {2:.3f}s, new {3:.3f}s ({4:.1f}x faster)".format(
+            name, rows, old_seconds, new_seconds, old_seconds / new_seconds
+        )
+    )
+
+
+def synthetic_assets(rows: int, seed: int = 0) -> DataFrame:
+    """
+    A Schedule A-shaped frame mixing every range_map key, exact dollar values and
+    the usual combined/not-reported unearned income cases.
+    """
+    rng = np.random.default_rng(seed)
+    asset_values = list(parse_pfds.range_map) + [
+        "$3,000",
+        "$12,400.23",
+        "$1.00",
+        "$.12",
+        "$250,000.5",
+    ]
+    income_pairs = [(key, key) for key in parse_pfds.range_map] + [
+        ("$1,000", "$2,500.00"),
+        ("Not Applicable", "$201 - $1,000"),
+        ("$201 - $1,000", np.nan),
+        ("None", "Not Applicable"),
+        (np.nan, np.nan),
+        ("Not Applicable", "Not Applicable"),
+        ("over $5,000,000", "$1 - $200"),
+        ("$2,501 - $5,000 $5,001 - $15,000",) * 2,
+        ("$2,501 - None $5,000",) * 2,
+        ("None None",) * 2,
+        ("$50,001 - $15,001 - $100,000 $50,000",) * 2,
+    ]
+    pairs = [income_pairs[i] for i in rng.integers(len(income_pairs), size=rows)]
+    return DataFrame(
+        {
+            "file": rng.integers(10000000, 10040000, size=rows).astype(str),
+            "value-of-asset": rng.choice(np.array(asset_values, dtype=object), rows),
+            "income": [income for income, _ in pairs],
+            "income_prev_year": [prev_year for _, prev_year in pairs],
+        }
+    )
+
+
+def bench_ranges(rows: int):
+    """
+    Row-wise apply vs. the columnar range parsers in parse_pfds.
+    """
+    assets = synthetic_assets(rows)
+    liabilities = assets.rename(columns={"value-of-asset": "amount-of-liability"})
+
+    for name, row_parser, column_parser, df in [
+        ("assets", parse_pfds.parse_asset, parse_pfds.parse_assets, assets),
+        (
+            "liabilities",
+            parse_pfds.parse_liability,
+            parse_pfds.parse_liabilities,
+            liabilities,
+        ),
+        (
+            "unearned income",
+            parse_pfds.parse_unearned_income,
+            parse_pfds.parse_unearned_incomes,
+            assets,
+        ),
+    ]:
+        old, old_seconds = timed(df.apply, row_parser, axis=1)
+        new, new_seconds = timed(column_parser, df)
+        old.columns = new.columns
+        pd.testing.assert_frame_equal(old, new)
+        report(name, old_seconds, new_seconds, rows)
+
+
+def write_synthetic_disclosures(folder: str, rows: int, seed: int = 0):
+    """
+    The three tables house-pfd-parser writes, laid out the way it writes them:
+    "{DocID} - None disclosed" lines before the header and in between the
+    documents, a header repeated halfway through (as left by concatenating
+    parser runs), and each document's rows together. Some earned income
+    documents only have blank amounts, enough of them to fill whole chunks.
+    """
+    rng = np.random.default_rng(seed)
+    assets = synthetic_assets(rows, seed).sort_values("file", kind="stable")
+    liabilities = assets.rename(columns={"value-of-asset": "amount-of-liability"})
+    amounts = np.array(["$1,000 $2,500", "$300", "N/A $5,000", "$ $1.50"], object)
+    earned_income = DataFrame(
+        {"file": assets["file"], "amount": rng.choice(amounts, len(assets))}
+    )
+    # A run of documents with blank amounts, 4% of the rows
+    start = len(earned_income) // 4
+    run = earned_income["file"].iloc[start : start + len(earned_income) // 25]
+    earned_income.loc[earned_income["file"].isin(run), "amount"] = np.nan
+
+    tables = [
+        (
+            "assets-and-unearned-income.csv",
+            ["file", "page", "asset", "value-of-asset", "income", "income"],
+            lambda row: ["A" + row["file"], row["value-of-asset"], row["income"]]
+            + [row["income_prev_year"]],
+            assets,
+        ),
+        (
+            "liabilities.csv",
+            ["file", "page", "creditor", "amount-of-liability"],
+            # Now and then a field that says "None disclosed" too
+            lambda row: [
+                "Bank - None disclosed" if row["file"].endswith("7") else "Bank",
+                row["amount-of-liability"],
+            ],
+            liabilities,
+        ),
+        (
+            "earned-income.csv",
+            ["file", "page", "source", "amount"],
+            lambda row: ["Salary", row["amount"]],
+            earned_income,
+        ),
+    ]
+    for name, header, fields, df in tables:
+        with open(os.path.join(folder, name), "w", newline="") as f:
+            writer = csv.writer(f)
+            f.write("1000 - None disclosed\n1001 - None disclosed,,\n")
+            writer.writerow(header)
+            previous = None
+            repeated = False
+            for i, row in enumerate(df.to_dict("records")):
+                if row["file"] != previous and rng.integers(20) == 0:
+                    f.write("{0} - None disclosed\n".format(rng.integers(10**7)))
+                if row["file"] != previous and i >= len(df) // 2 and not repeated:
+                    writer.writerow(header)
+                    f.write("2000 - None disclosed\n")
+                    repeated = True
+                writer.writerow([row["file"], 1] + fields(row))
+                previous = row["file"]
+
+
+def legacy_stream_sums_by_file(filename, clean, columns, chunksize: int):
+    """
+    parse_pfds.stream_sums_by_file as it was: a pass over the file to find the
+    header, and the "None disclosed" rows and repeated headers dropped from
+    each chunk read_csv parsed.
+    """
+    start = 0
+    with open(filename) as f:
+        for line in f:
+            if "file,page" in line:
+                break
+            start += 1
+
+    partials = []
+    held_back = None
+    for chunk in pd.read_csv(filename, skiprows=start, chunksize=chunksize, dtype=str):
+        chunk = chunk[
+            ~(chunk["file"].str.contains("None disclosed") | (chunk["file"] == "file"))
+        ]
+        if len(chunk) == 0:
+            continue
+        if held_back is not None:
+            chunk = pd.concat([held_back, chunk])
+        last = chunk["file"].iloc[-1]
+        held_back = chunk[chunk["file"] == last]
+        chunk = chunk[chunk["file"] != last]
+        if len(chunk) > 0:
+            partials.append(parse_pfds.sum_by_file(clean(chunk), columns))
+    if held_back is not None:
+        partials.append(parse_pfds.sum_by_file(clean(held_back), columns))
+    partials = [sums for sums in partials if len(sums) > 0]
+    return pd.concat(partials).groupby(level=0).sum()
+
+
+def bench_disclosures(rows: int):
+    """
+    Summing the parsed disclosure tables by file a chunk at a time, as before
+    vs. through the single-pass split of the file. Both are checked against
+    loading the tables whole.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_disclosures(tmp, rows)
+        chunksize = max(rows // 50, 100)
+        for name, clean, columns in parse_pfds.DISCLOSURE_TABLES:
+            path = os.path.join(tmp, name)
+            df, no_disclosures = parse_pfds.open_disclosure_file(path)
+            whole = parse_pfds.sum_by_file(clean(df), columns)
+            old, old_seconds = timed(
+                legacy_stream_sums_by_file, path, clean, columns, chunksize
+            )
+            new, new_seconds = timed(
+                parse_pfds.stream_sums_by_file, path, clean, columns, chunksize
+            )
+            pd.testing.assert_frame_equal(whole, old)
+            pd.testing.assert_frame_equal(whole, new)
+            # The markers before the first header, between the documents and
+            # after the repeated one
+            assert len(no_disclosures) > 3
+            assert "1001" in no_disclosures and "2000" in no_disclosures
+            report("disclosures ({0})".format(name), old_seconds, new_seconds, rows)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stands in for the House Clerk's server: /{doc}.pdf serves a fake PDF after a
+    short delay, except that DocIDs ending in 7 are missing, ones ending in 3
+    get cut off halfway through the transfer and ones ending in 5 are gzipped.
+    """
+
+    body = b"%PDF-1.4\n" + b"x" * 200000
+    latency = 0.02
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        doc = os.path.basename(self.path).split(".")[0]
+        if doc.endswith("7"):
+            self.send_error(404)
+            return
+        body = gzip.compress(self.body) if doc.endswith("5") else self.body
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if doc.endswith("5"):
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if doc.endswith("3"):
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_parse_cache(rows: int):
+    """
+    Parsing `rows` (at most 2,000) stand-in pdfs through parse_cache with a
+    parser that dies halfway through, but exits normally (as house-pfd-parser
+    used to), and then again with one that gets through them all. Checks that
+    the second run parses exactly the files the first one didn't get to, rather
+    than timing anything.
+    """
+    rows = min(rows, 2000)
+    runs = []
+
+    def parse(give_up_after):
+        def parse_folder(file_path, out_path):
+            docs = sorted(parse_cache.doc_id(f) for f in os.listdir(file_path))
+            runs.append(docs)
+            os.makedirs(out_path)
+            with open(os.path.join(out_path, "liabilities.csv"), "w") as f:
+                f.write("file,page,creditor,amount-of-liability\n")
+                for doc in docs[:give_up_after]:
+                    f.write("{0},1,Bank,$1 - $200\n".format(doc))
+
+        return parse_folder
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "raw")
+        os.makedirs(file_path)
+        for i in range(rows):
+            with open(
+                os.path.join(file_path, "{0}.pdf".format(10000000 + i)), "w"
+            ) as f:
+                f.write("%PDF-1.4 {0}".format(i))
+        args = (file_path, os.path.join(tmp, "cache"), os.path.join(tmp, "out"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            first, first_seconds = timed(
+                parse_cache.parse_with_cache, *args, parse(rows // 2)
+            )
+            second, second_seconds = timed(
+                parse_cache.parse_with_cache, *args, parse(rows)
+            )
+            third = parse_cache.parse_with_cache(*args, parse(rows))
+        merged = pd.read_csv(os.path.join(tmp, "out", "liabilities.csv"), dtype=str)
+
+    # The files the first parser never got to are parsed on the next run
+    assert len(runs) == 2 and first == runs[0] and len(first) == rows
+    assert second == runs[1] == first[rows // 2 :]
+    assert third == []
+    assert sorted(merged["file"]) == first
+    print(
+        "parse_cache: {0} files, {1} parsed before the parser died ({2:.3f}s), "
+        "the other {3} on the next run ({4:.3f}s)".format(
+            rows, rows // 2, first_seconds, len(second), second_seconds
+        )
+    )
+
+
+def bench_download(rows: int):
+    """
+    Sequential requests.get loop vs. the concurrent downloader, against a local
+    stand-in server.
+    """
+    files = min(rows, 200)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url_format = "http://127.0.0.1:{0}/{{doc}}.pdf".format(server.server_port)
+    doc_ids = range(10000000, 10000000 + files)
+
+    with tempfile.TemporaryDirectory() as old_dir, tempfile.TemporaryDirectory() as new_dir:
+
+        def download_sequentially():
+            for doc in doc_ids:
+                try:
+                    r = downloader.requests.get(url_format.format(doc=doc))
+                except downloader.requests.RequestException:
+                    continue
+                with open(os.path.join(old_dir, "{0}.pdf".format(doc)), "wb") as f:
+                    f.write(r.content)
+
+        jobs = [
+            (url_format.format(doc=doc), os.path.join(new_dir, "{0}.pdf".format(doc)))
+            for doc in doc_ids
+        ]
+        _, old_seconds = timed(download_sequentially)
+        df_results, new_seconds = timed(
+            downloader.download_files, jobs, retries=2, backoff=0.01
+        )
+
+        # Only the complete PDFs should have been kept.
+        expected = sorted(
+            "{0}.pdf".format(doc) for doc in doc_ids if str(doc)[-1] not in "37"
+        )
+        assert sorted(os.listdir(new_dir)) == expected
+        assert all(downloader.is_pdf(os.path.join(new_dir, f)) for f in expected)
+        # The gzipped ones are stored decompressed
+        assert all(
+            os.path.getsize(os.path.join(new_dir, f)) == len(StandInHandler.body)
+            for f in expected
+        )
+        assert df_results["error"].notna().sum() == files - len(expected)
+    server.shutdown()
+    report("download", old_seconds, new_seconds, files)
+
+
+CONTRIB_COLUMNS = [
+    ("cycle", "integer"),
+    ("transaction.id", "text"),
+    ("amount", "real"),
+    ("date", "text"),
+    ("bonica.cid", "integer"),
+    ("contributor.name", "text"),
+    ("contributor.zipcode", "text"),
+    ("contributor.state", "text"),
+    ("recipient.name", "text"),
+    ("bonica.rid", "text"),
+    ("recipient.party", "integer"),
+    ("recipient.state", "text"),
+    ("seat", "text"),
+    ("election.type", "text"),
+    ("recipient.type", "text"),
+]
+
+
+def write_synthetic_contributions(path: str, rows: int, seed: int = 0):
+    """
+    A contribDB-shaped CSV, including blank cells and comma-formatted amounts.
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in CONTRIB_COLUMNS])
+        for i in range(rows):
+            writer.writerow(
+                [
+                    2014 + 2 * (i % 3),
+                    "tx{0}".format(i),
+                    "{0:,.2f}".format(rng.integers(1, 500000) / 100),
+                    "2018-{0:02d}-{1:02d}".format(i % 12 + 1, i % 28 + 1),
+                    rng.integers(1, 10**9),
+                    "DONOR, NUMBER {0}".format(i % 5000),
+                    "" if i % 7 == 0 else "{0:05d}".format(i % 99999),
+                    ["CA", "TX", "NY"][i % 3],
+                    "CANDIDATE {0}".format(i % 800),
+                    "cand{0}".format(i % 800),
+                    100 if i % 2 else 200,
+                    ["CA", "TX"][i % 800 % 2],
+                    "federal:house",
+                    "P" if i % 3 else "G",
+                    "CAND",
+                ]
+            )
+
+
+def legacy_convert(path: str, dbpath: str, types):
+    """
+    csv_to_sqlite.convert as it was: one execute per row, default PRAGMAs.
+    """
+    conn = sqlite3.connect(dbpath)
+    c = conn.cursor()
+    c.execute(
+        "CREATE TABLE contribDB (%s)"
+        % ",".join('"%s" %s' % column for column in CONTRIB_COLUMNS)
+    )
+    insert = "INSERT INTO contribDB VALUES (%s)" % ",".join(["?"] * len(types))
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            row = [
+                (
+                    None
+                    if x == ""
+                    else (
+                        float(x.replace(",", ""))
+                        if y == "real"
+                        else int(x) if y == "integer" else x
+                    )
+                )
+                for (x, y) in zip(row, types)
+            ]
+            c.execute(insert, row)
+    conn.commit()
+    conn.close()
+
+
+def bench_sqlite(rows: int):
+    """
+    Row-at-a-time inserts vs. the batched csv_to_sqlite.convert with the bulk
+    PRAGMA profile.
+    """
+    types = [_type for _, _type in CONTRIB_COLUMNS]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "contribDB.csv")
+        types_path = os.path.join(tmp, "types.csv")
+        write_synthetic_contributions(csv_path, rows)
+        with open(types_path, "w") as f:
+            f.write(",".join(types) + "\n")
+
+        old_db = os.path.join(tmp, "old.sqlite3")
+        new_db = os.path.join(tmp, "new.sqlite3")
+        _, old_seconds = timed(legacy_convert, csv_path, old_db, types)
+        _, new_seconds = timed(
+            csv_to_sqlite.convert,
+            csv_path,
+            new_db,
+            "contribDB",
+            typespath_or_fileobj=types_path,
+            pragmas=csv_to_sqlite.PRAGMA_PROFILES["bulk"],
+        )
+
+        query = "SELECT * FROM contribDB ORDER BY rowid"
+        old = pd.read_sql(query, sqlite3.connect(old_db))
+        pd.testing.assert_frame_equal(old, pd.read_sql(query, sqlite3.connect(new_db)))
+
+        check_sqlite_errors(tmp, types_path)
+    report("csv_to_sqlite", old_seconds, new_seconds, rows)
+
+
+def check_sqlite_errors(tmp: str, types_path: str):
+    """
+    A row SQLite won't take (here an integer too big for it) is skipped, and the
+    rest of its batch still goes in. A stray quote in an unquoted field is loaded
+    as it is, and an error from SQLite itself stops the load.
+    """
+    csv_path = os.path.join(tmp, "bad_rows.csv")
+    write_synthetic_contributions(csv_path, 1000, seed=1)
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    df.loc[500, "bonica.cid"] = str(10**30)
+    df.to_csv(csv_path, index=False)
+    # Written as it is, since to_csv would quote it
+    with open(csv_path) as f:
+        text = f.read()
+    with open(csv_path, "w") as f:
+        f.write(text.replace(",cand100,", ',cand"100,', 1))
+
+    db = os.path.join(tmp, "bad_rows.sqlite3")
+    csv_to_sqlite.convert(
+        csv_path, db, "contribDB", typespath_or_fileobj=types_path, batch_size=300
+    )
+    loaded = pd.read_sql("SELECT * FROM contribDB ORDER BY rowid", sqlite3.connect(db))
+    assert list(loaded["transaction.id"]) == list(df["transaction.id"].drop(500))
+    assert loaded["bonica.rid"][100] == 'cand"100'
+
+    # One column short of the CSV
+    db = os.path.join(tmp, "wrong_table.sqlite3")
+    sqlite3.connect(db).execute(
+        "CREATE TABLE contribDB (%s)"
+        % ",".join('"%s" %s' % column for column in CONTRIB_COLUMNS[:-1])
+    )
+    try:
+        csv_to_sqlite.convert(
+            csv_path, db, "contribDB", typespath_or_fileobj=types_path
+        )
+    except sqlite3.OperationalError:
+        return
+    raise AssertionError("Loading into the wrong table didn't fail")
+
+
+LAST_NAMES = [
+    "SMITH", "JOHNSON", "WILLIAMS", "BROWN", "JONES", "GARCIA", "MILLER", "DAVIS",
+    "RODRIGUEZ", "MARTINEZ", "HERNANDEZ", "LOPEZ", "GONZALEZ", "WILSON", "ANDERSON",
+    "THOMAS", "TAYLOR", "MOORE", "JACKSON", "MARTIN", "LEE", "PEREZ", "THOMPSON",
+    "WHITE", "HARRIS", "SANCHEZ", "CLARK", "RAMIREZ", "LEWIS", "ROBINSON", "OROURKE",
+    "VANHOLLEN", "MCCARTHY", "DELAURO", "SCHAKOWSKY", "KRISHNAMOORTHI",
+]  # fmt: skip
+FIRST_NAMES = [
+    ("ROBERT", "BOB"), ("WILLIAM", "BILL"), ("ELIZABETH", "LIZ"), ("JAMES", "JIM"),
+    ("MICHAEL", "MIKE"), ("KATHERINE", "KATIE"), ("RICHARD", "DICK"),
+    ("PATRICIA", "PATTY"), ("THOMAS", "TOM"), ("JENNIFER", "JEN"), ("ANN", ""),
+    ("MARIA", ""), ("RAJA", ""), ("DEBRA", "DEB"), ("STENY", ""),
+]  # fmt: skip
+
+
+def typo(name: str, rng) -> str:
+    # Drop, double or swap a letter somewhere in the name
+    if len(name) < 3:
+        return name
+    i = int(rng.integers(1, len(name) - 1))
+    kind = rng.integers(3)
+    if kind == 0:
+        return name[:i] + name[i + 1 :]
+    if kind == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[: i - 1] + name[i] + name[i - 1] + name[i + 1 :]
+
+
+def synthetic_crosswalk(rows: int, seed: int = 0):
+    """
+    DIME candidates (a few per district and cycle) and a manifest of roughly
+    `rows` filings by them, with the names the way filers actually write them:
+    mostly as in DIME, but also with nicknames, typos, hyphenated or compound
+    last names, and some filers that aren't in DIME at all.
+    """
+    rng = np.random.default_rng(seed)
+    cands = []
+    filings = []
+    states = ["AL", "CA", "FL", "IL", "NY", "PA", "TX", "WA"]
+    while len(filings) < rows:
+        district = "{0}{1:02d}".format(
+            states[rng.integers(len(states))], rng.integers(1, 30)
+        )
+        cycle = int(rng.choice([2014, 2016, 2018, 2020]))
+        for _ in range(rng.integers(2, 6)):
+            last = LAST_NAMES[rng.integers(len(LAST_NAMES))]
+            first, nickname = FIRST_NAMES[rng.integers(len(FIRST_NAMES))]
+            rid = "cand{0}".format(len(cands))
+            cands.append(
+                {
+                    "rid": rid,
+                    "cycle": cycle,
+                    "district": district,
+                    "llname": last,
+                    "name": "{0},{1}".format(last, first),
+                    "lname": last,
+                    "ffname": first,
+                    "fname": first,
+                    "mname": np.nan,
+                    "nname": nickname or np.nan,
+                    "title": np.nan,
+                    "suffix": np.nan,
+                }
+            )
+            variant = rng.integers(10)
+            if variant == 0:
+                first = nickname or first
+            elif variant == 1:
+                last = typo(last, rng)
+            elif variant == 2:
+                first = typo(first, rng)
+            elif variant == 3:
+                last = "NOTINDIME"
+            filings.append(
+                {
+                    "pfd_id": 10000000 + len(filings),
+                    "cycle": cycle,
+                    "district": district,
+                    "last": last,
+                    "first": first,
+                    "true_rid": rid if last != "NOTINDIME" else np.nan,
+                }
+            )
+    return DataFrame(filings), DataFrame(cands)
+
+
+def legacy_create_crosswalk(df_manifest: DataFrame, df_dime: DataFrame) -> DataFrame:
+    """
+    create_crosswalk's matching as it was, filtering all of df_dime for every
+    manifest row.
+    """
+
+    def find_matching_rid(row):
+        result = {"pfd_id": row["pfd_id"], "cycle": row["cycle"], "rid": None}
+        in_district = (df_dime["district"] == row["district"]) & (
+            df_dime["cycle"] == row["cycle"]
+        )
+        df_candidate_set = df_dime[
+            in_district & df_dime["lname"].str.contains(row["last"], regex=False)
+        ]
+        if len(df_candidate_set) == 1:
+            result["rid"] = df_candidate_set.iloc[0]["rid"]
+        elif len(df_candidate_set) == 0:
+            matched = False
+            df_candidate_set = df_dime[
+                (df_dime.district.str[:2] == row["district"][:2])
+                & (df_dime["cycle"] == row["cycle"])
+                & df_dime["lname"].str.contains(row["last"], regex=False)
+                & df_dime["ffname"].str.contains(row["first"], regex=False)
+            ]
+            if len(df_candidate_set) == 1:
+                matched = True
+                result["rid"] = df_candidate_set.iloc[0]["rid"]
+            if not matched:
+                df_candidate_set = df_dime[
+                    in_district
+                    & df_dime["ffname"].str.contains(row["first"], regex=False)
+                ]
+                if len(df_candidate_set) == 1:
+                    matched = True
+                    result["rid"] = df_candidate_set.iloc[0]["rid"]
+            if not matched and row["cycle"] <= 2018:
+                result["rid"] = "missing"
+        else:
+            df_candidate_set = df_dime[
+                in_district
+                & df_dime["lname"].str.contains(row["last"], regex=False)
+                & df_dime["ffname"].str.contains(row["first"], regex=False)
+            ]
+            if len(df_candidate_set) > 1 and row["cycle"] <= 2018:
+                result["rid"] = "dupe"
+            elif len(df_candidate_set) == 0:
+                result["rid"] = "dupe"
+            else:
+                result["rid"] = df_candidate_set.iloc[0]["rid"]
+        return pd.Series(result)
+
+    return df_manifest.apply(find_matching_rid, axis=1)
+
+
+def bench_crosswalk(rows: int):
+    """
+    Exact (blocked) crosswalk matching vs. the same with fuzzy matching of the
+    rows it leaves unresolved. This is about what the fuzzy pass costs and how
+    many rows it resolves, rather than a speedup. The exact matching is checked
+    against the original, unblocked matcher first, on at most 2,000 rows as
+    that one takes a while.
+    """
+    df_manifest, df_dime = synthetic_crosswalk(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = tmp + "/"
+        df_sample = df_manifest.head(2000)
+        old, old_seconds = timed(legacy_create_crosswalk, df_sample, df_dime)
+        new, new_seconds = timed(
+            crosswalk.create_crosswalk,
+            df_sample,
+            df_dime,
+            fuzzy=False,
+            out_path=out_path,
+        )
+        # Rows with no rid come back as None or NaN, depending on the dtype
+        pd.testing.assert_frame_equal(
+            old[["pfd_id", "cycle", "rid"]].astype(object).where(old.notna(), None),
+            new[["pfd_id", "cycle", "rid"]].astype(object).where(new.notna(), None),
+            check_dtype=False,
+            check_index_type=False,
+        )
+        report("crosswalk (exact)", old_seconds, new_seconds, len(df_sample))
+
+        exact, exact_seconds = timed(
+            crosswalk.create_crosswalk,
+            df_manifest,
+            df_dime,
+            fuzzy=False,
+            out_path=out_path,
+        )
+        fuzzy, fuzzy_seconds = timed(
+            crosswalk.create_crosswalk,
+            df_manifest,
+            df_dime,
+            fuzzy=True,
+            out_path=out_path,
+        )
+        candidates = pd.read_csv(out_path + "crosswalk_candidates.csv")
+
+    unresolved = ["missing", "dupe", None]
+    # Whatever exact matching settled, fuzzy matching must leave alone
+    settled = ~exact["rid"].isin(unresolved)
+    assert (exact["rid"][settled] == fuzzy["rid"][settled]).all()
+    resolved = ~settled & ~fuzzy["rid"].isin(unresolved)
+    # Only the fuzzy crosswalk says how each row was matched
+    assert list(exact.columns) == ["pfd_id", "cycle", "rid"]
+    assert (fuzzy["match_method"][settled] == "exact").all()
+    assert (fuzzy["match_method"][resolved] == "fuzzy").all()
+    assert fuzzy["match_method"][~settled & ~resolved].isna().all()
+    correct = fuzzy["rid"][resolved] == df_manifest["true_rid"][resolved]
+    print(
+        "crosswalk: {0} rows, exact {1:.3f}s, exact + fuzzy {2:.3f}s; "
+        "fuzzy matching resolved {3} of {4} unresolved rows ({5} correctly), "
+        "{6} ranked candidates listed for review".format(
+            len(df_manifest),
+            exact_seconds,
+            fuzzy_seconds,
+            resolved.sum(),
+            (~settled).sum(),
+            correct.sum(),
+            len(candidates),
+        )
+    )
+
+
+def bench_fuzzy(rows: int):
+    """
+    Ranking the DIME candidates for the rows exact matching leaves unresolved
+    (about a sixth of the synthetic manifest's, so `--rows 10000` gives
+    about 1,700), one pair at a time, with the similarity cache empty
+    and then full. No speedup here: it's how long the fuzzy path takes, and how
+    big the blocks it scores are.
+    """
+    df_manifest, df_dime = synthetic_crosswalk(rows)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        exact = crosswalk.create_crosswalk(
+            df_manifest, df_dime, fuzzy=False, out_path=tmp + "/"
+        )
+    todo = df_manifest[exact["rid"].isin(["missing", "dupe"]) | exact["rid"].isna()]
+    by_district, _ = crosswalk.index_dime_blocks(df_dime)
+    blocks = [
+        by_district.get((row.district, row.cycle), []) for row in todo.itertuples()
+    ]
+
+    def rank_all():
+        return [
+            name_matching.resolve(
+                name_matching.rank_candidates(row.last, row.first, block)
+            )
+            for row, block in zip(todo.itertuples(), blocks)
+        ]
+
+    name_matching.jaro_winkler.cache_clear()
+    cold, cold_seconds = timed(rank_all)
+    cache = name_matching.jaro_winkler.cache_info()
+    warm, warm_seconds = timed(rank_all)
+    assert cold == warm
+    sizes = [len(block) for block in blocks]
+    print(
+        "fuzzy: {0} unresolved rows, blocks of {1:.1f} candidates on average "
+        "(at most {2}); {3:.3f}s with the cache empty ({4:.2f}ms a row, "
+        "{5:.0%} of the comparisons cached), {6:.3f}s with it full".format(
+            len(todo),
+            np.mean(sizes),
+            max(sizes),
+            cold_seconds,
+            1000 * cold_seconds / len(todo),
+            cache.hits / (cache.hits + cache.misses),
+            warm_seconds,
+        )
+    )
+
+
+def legacy_normalize_pfd(df: DataFrame) -> DataFrame:
+    """
+    get_pfd_manifest's name and district cleanup as it was.
+    """
+    df = df.copy()
+
+    def fix_district(row):
+        if row["district"][-2:] == "00":
+            return row["district"][:-2] + "01"
+        return row["district"]
+
+    df["district"] = df.apply(fix_district, axis=1)
+    for name_field in ["prefix", "last", "first", "suffix"]:
+        df[name_field] = (
+            df[name_field]
+            .astype(str)
+            .str.upper()
+            .apply(unidecode)
+            .str.replace(r"[- ]", "", regex=True)
+        )
+    return df
+
+
+def legacy_normalize_dime(df: DataFrame, name_fields) -> DataFrame:
+    """
+    get_dime_manifest's name cleanup as it was.
+    """
+    df = df.copy()
+    for name_field in name_fields:
+        df[name_field] = df[name_field].str.upper().str.replace(r"[- ]", "", regex=True)
+    df["llname"] = df["name"].apply(lambda x: x.split(",")[0])
+    return df
+
+
+def bench_normalize(rows: int):
+    """
+    Row-wise vs. vectorized name normalization and district fixing, for
+    manifests of `rows` rows (the real ones have about a tenth of the default).
+    """
+    rng = np.random.default_rng(0)
+    lasts = np.array(
+        LAST_NAMES + ["Núñez", "Sánchez-Ortiz", "O'Neil", "Van Hollen", "del Toro"],
+        dtype=object,
+    )
+    firsts = np.array(
+        [first.title() for first, _ in FIRST_NAMES] + ["José", "Mary Kay", np.nan],
+        dtype=object,
+    )
+    pfd = DataFrame(
+        {
+            "prefix": rng.choice(
+                np.array(["Hon.", "Mr.", "Dr.", np.nan], dtype=object), rows
+            ),
+            "last": rng.choice(lasts, rows),
+            "first": rng.choice(firsts, rows),
+            "suffix": rng.choice(np.array(["Jr.", "III", np.nan], dtype=object), rows),
+            "district": rng.choice(np.array(["CA12", "TX00", "VT00", "NY03"]), rows),
+        }
+    )
+    dime = DataFrame(
+        {
+            "name": [
+                "{0}, {1}".format(last, first)
+                for last, first in zip(
+                    rng.choice(lasts, rows), rng.choice(firsts, rows)
+                )
+            ],
+            "lname": rng.choice(lasts, rows),
+            "ffname": rng.choice(firsts, rows),
+            "nname": rng.choice(firsts, rows),
+        }
+    )
+    name_fields = ["name", "lname", "ffname", "nname"]
+
+    def normalize_pfd(df):
+        df = df.copy()
+        df["district"] = normalize.fix_at_large(df["district"].astype("category"))
+        fields = ["prefix", "last", "first", "suffix"]
+        df[fields] = normalize.normalize_names(
+            df[fields].astype(str), fields, ascii=True
+        )
+        return df
+
+    def normalize_dime(df):
+        df = df.copy()
+        df[name_fields] = normalize.normalize_names(df, name_fields)
+        df["llname"] = normalize.last_names(df["name"])
+        return df
+
+    for name, legacy, vectorized, df in [
+        ("pfd names", legacy_normalize_pfd, normalize_pfd, pfd),
+        (
+            "dime names",
+            lambda df: legacy_normalize_dime(df, name_fields),
+            normalize_dime,
+            dime,
+        ),
+    ]:
+        normalize.transliterate.cache_clear()
+        old, old_seconds = timed(legacy, df)
+        new, new_seconds = timed(vectorized, df)
+        pd.testing.assert_frame_equal(old, new)
+        report(name, old_seconds, new_seconds, rows)
+
+
+def legacy_clean_duplicates(dime_df: DataFrame) -> DataFrame:
+    """
+    clean_duplicates' hand-coded fixes as they were, one after another.
+    """
+    # George "Mike" Kelly is listed as both names...
+    dime_df = dime_df[dime_df["Cand.ID"] != "H4PA03117"]
+    dime_df.loc[dime_df["Cand.ID"] == "H0PA03271", "Cand.ID"] = "H4PA03117"
+
+    # And Corey McKinnon, and several others are given dupe IDs in 2016
+    def remove_bad_ids(df, bad_ids, cycle):
+        return df[~((df["Cand.ID"].isin(bad_ids)) & (df["cycle"] == cycle))]
+
+    bad_ids_2018 = [
+        "H6TX32043",
+        "H8NV03275",
+        "H6NV03097",
+        "H4NJ10085",
+        "H8IA03108",
+        "H8NJ04162",
+        "H1CA34014",
+        "H7GA06015",
+        "H7CA34011",
+        "H7CA34029",
+        "H6CA08207",
+        "H2IL02156",
+    ]
+    # Some people have name changes, some people just don't actually match to anything
+    # because they dropped out before the primary election happened.
+    bad_ids_2016 = [
+        "H6CT01156",
+        "H6NC03146",
+        "H4FL05073",
+        "H6NY06133",
+        "H4NV01153",
+        "H6NJ10205",
+        "H6FL18154",
+        "H4CA48042",
+        "H6TX32076",
+        "H6NE01127",
+        "H6PA02189",
+        "H0CA27101",
+        "H6MI09203",
+        "H2MO05352",
+        "H6CA25185",
+        "H6CA08215",
+        "H2FL08063",
+        "H2TX01062",
+        "H6FL11142",
+        "H6IN06149",
+        "H2TX25269",
+        "H2AZ08078",
+        "H2TX36134",
+        "H6NY13147",
+        "H6CA42099",
+        "H6FL18063",
+    ]
+    bad_ids_2014 = [
+        "H4CO04066",
+        "H4OH03071",
+        "nv_TEMP_e71636807a",
+        "ky_TEMP_9c9d896076",
+        "H4PA04107",
+        "H4AZ06102",
+        "H4OK02170",
+        "H4WA07057",
+        "H4WA09053",
+        "H6CA08207",
+        "H4CA29026",
+        "H2TX25269",
+        "H4NJ03114",
+        "H2FL20076",
+    ]
+
+    dime_df = remove_bad_ids(dime_df, bad_ids_2018, 2018)
+    dime_df = remove_bad_ids(dime_df, bad_ids_2016, 2016)
+    dime_df = remove_bad_ids(dime_df, bad_ids_2014, 2014)
+
+    # Swap some people around
+    def replace_cand_id(df, old_cand_id, new_cand_id, cycle):
+        df.loc[(df["Cand.ID"] == old_cand_id) & (df.cycle == cycle), "Cand.ID"] = (
+            new_cand_id
+        )
+
+    replace_cand_id(dime_df, "H2NV04045", "H8NV03275", 2018)
+    replace_cand_id(dime_df, "H4NV01153", "H6NV03097", 2018)
+    replace_cand_id(dime_df, "H6NV03097", "H4NV01153", 2016)
+    replace_cand_id(dime_df, "H2CA00138", "H6CA08215", 2016)
+    replace_cand_id(dime_df, "H4FL23076", "H2FL08063", 2016)
+    replace_cand_id(dime_df, "H6IN06206", "H6IN06149", 2016)
+    replace_cand_id(dime_df, "H6AZ02189", "H2AZ08078", 2016)
+    replace_cand_id(dime_df, "H8CA08120", "H6CA08120", 2018)
+
+    # 2 different NY Maloneys both have rid cand1318... we don't really care
+    # that much, since they're both incumbents, so just drop one arbitrarily.
+    dime_df = dime_df[dime_df["Cand.ID"] != "H2NY14037"]
+
+    # Fix some challenger/open-seat/incumbent discrepancies from the dupes
+    dime_df.loc[
+        (dime_df.rid == "cand134815") & (dime_df.cycle == 2016), "Incum.Chall"
+    ] = "O"
+    dime_df.loc[
+        (dime_df.rid == "cand41543") & (dime_df.cycle == 2016), "Incum.Chall"
+    ] = "O"
+    dime_df.loc[
+        (dime_df.rid == "cand139792") & (dime_df.cycle == 2018), "Incum.Chall"
+    ] = "I"
+
+    # Other random dupes
+    dime_df = dime_df[dime_df["Cand.ID"] != "H8NC08109"]
+    dime_df = dime_df[dime_df.name != "ARATA, LAWRENCE V MR. III"]
+
+    # In the other directions, a couple of distinct rids are actually the same person:
+    dime_df = dime_df[dime_df.rid != "cand143177"]
+    dime_df = dime_df[dime_df.rid != "cand144114"]
+    dime_df = dime_df[dime_df.rid != "cand145023"]
+    dime_df.loc[dime_df.rid == "cand145026", "Cand.ID"] = "H8CA53092"
+    dime_df = dime_df[~((dime_df.rid == "cand144802") & (dime_df.cycle == 2018))]
+    return dime_df
+
+
+def synthetic_candidates(seed: int = 0) -> DataFrame:
+    """
+    DIME candidates with every Cand.ID, rid and name that corrections.csv
+    mentions (the values it looks for and the ones it writes) in every cycle,
+    alone and combined with each other, among some that no rule touches.
+    """
+    rng = np.random.default_rng(seed)
+    rules = corrections.load_rules()
+    keys = {
+        column: sorted(
+            set(rules.loc[rules["column"] == column, "value"])
+            | set(rules.loc[rules["field"] == column, "new_value"])
+        )
+        + ["{0}_other{1}".format(column, i) for i in range(20)]
+        for column in corrections.KEY_COLUMNS
+    }
+    rows = []
+    for cycle in [2014, 2016, 2018, 2020]:
+        for column, values in keys.items():
+            for value in values:
+                # Once with keys no rule looks for, so that every rule has a row
+                # to itself, and once with random ones
+                for alone in [True, False]:
+                    row = {
+                        other: (
+                            keys[other][-1]
+                            if alone
+                            else keys[other][rng.integers(len(keys[other]))]
+                        )
+                        for other in corrections.KEY_COLUMNS
+                    }
+                    row[column] = value
+                    row["cycle"] = cycle
+                    row["Incum.Chall"] = ["I", "C", "O"][rng.integers(3)]
+                    row["total_primary"] = float(rng.integers(1000, 10**6))
+                    rows.append(row)
+    return DataFrame(rows)
+
+
+def bench_corrections(rows: int):
+    """
+    clean_duplicates' fixes one after another, as they were, vs. the rule table
+    in dime/corrections.csv applied in one go, on candidates that every rule
+    matches. This checks that they do the same, rather than timing anything, so
+    the synthetic frame is only as big as it needs to be, whatever `rows` is.
+    """
+    df = synthetic_candidates()
+    rules = corrections.load_rules()
+    old, old_seconds = timed(legacy_clean_duplicates, df.copy())
+    with contextlib.redirect_stdout(io.StringIO()):
+        (new, audit), new_seconds = timed(corrections.apply_corrections, df, rules)
+    pd.testing.assert_frame_equal(old, new)
+    # Every rule found something to do
+    assert set(audit["line"]) == set(rules.index)
+    print(
+        "corrections: {0} rows, sequential edits {1:.3f}s, {2} rules from "
+        "corrections.csv {3:.3f}s, same result".format(
+            len(df), old_seconds, len(rules), new_seconds
+        )
+    )
+
+
+def bench_features(rows: int):
+    """
+    Extracting one campaign feature vs. ten of them (counts, donors, totals and
+    shares over three windows) from `rows` primary contributions, in chunks.
+    """
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2017-01-01") + rng.integers(0, 700, rows)
+    contribs = DataFrame(
+        {
+            "cycle": rng.choice([2014, 2016, 2018], rows),
+            "bonica.rid": np.char.add("cand", rng.integers(0, 2000, rows).astype(str)),
+            "date": start.astype(str),
+            "amount": rng.choice([25.0, 100.0, 250.0, 1000.0, 2700.0], rows),
+            "bonica.cid": rng.integers(0, rows // 10, rows),
+            "contributor.state": rng.choice(np.array(["CA", "TX", "NY"]), rows),
+            "recipient.state": rng.choice(np.array(["CA", "TX"]), rows),
+        }
+    ).sort_values(["cycle", "bonica.rid", "date"], kind="stable")
+    chunks = [contribs[i : i + 100000] for i in range(0, rows, 100000)]
+    one = [features.Feature("donors_ninety", "donors", 90)]
+    ten = [
+        features.Feature("{0}_{1}".format(metric, days), metric, days)
+        for metric in ["count", "donors", "total"]
+        for days in [30, 90, None]
+    ] + [features.Feature("small_share_90", "small_share", 90)]
+
+    _, one_seconds = timed(features.campaign_features, chunks, one)
+    df, ten_seconds = timed(features.campaign_features, chunks, ten)
+    print(
+        "features: {0} rows, {1} campaigns, 1 feature {2:.3f}s, "
+        "{3} features {4:.3f}s".format(
+            rows, len(df), one_seconds, len(ten), ten_seconds
+        )
+    )
+
+
+def io_read_bytes() -> int:
+    """
+    How many bytes this process has read so far (Linux only; 0 elsewhere).
+    """
+    if not os.path.exists("/proc/self/io"):
+        return 0
+    with open("/proc/self/io") as f:
+        counts = dict(line.split(": ") for line in f.read().splitlines())
+    return int(counts["rchar"])
+
+
+def run_ninety_days(dime_path: str, backend: str):
+    """
+    get_first_ninety_days_fundraising on the DIME files in dime_path, in a process
+    of its own. Returns its dime_uncleaned.csv, how long it took, how far its
+    peak RSS grew (in MB) and how many bytes it read.
+    """
+    import resource
+
+    import process_dime
+
+    process_dime.DIME_PATH = dime_path
+    process_dime.CONTRIB_STORE = os.path.join(dime_path, "contribDB.parquet")
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    read_before = io_read_bytes()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds = timed(process_dime.get_first_ninety_days_fundraising, backend)
+    read = io_read_bytes() - read_before
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_before) / 1024
+    output = pd.read_csv(os.path.join(dime_path, "dime_uncleaned.csv"), index_col=0)
+    return output, seconds, peak, read
+
+
+def bench_backends(rows: int):
+    """
+    The first-ninety-days aggregation over contribDB in SQLite vs. the Parquet
+    store, from the same contributions. Each runs in a fresh process, for its
+    peak RSS and the bytes it read, and they must write the same
+    dime_uncleaned.csv.
+    """
+    types = [_type for _, _type in CONTRIB_COLUMNS]
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "contribDB_2018.csv")
+        types_path = os.path.join(tmp, "types.csv")
+        write_synthetic_contributions(csv_path, rows)
+        with open(types_path, "w") as f:
+            f.write(",".join(types) + "\n")
+        db = os.path.join(tmp, "dime.sqlite3")
+        with contextlib.redirect_stdout(io.StringIO()):
+            csv_to_sqlite.convert(
+                csv_path,
+                db,
+                "contribDB",
+                typespath_or_fileobj=types_path,
+                parquet_path=os.path.join(tmp, "contribDB.parquet"),
+            )
+        # Every candidate the contributions are for, some of them listed twice,
+        # and some that have none
+        rids = ["cand{0}".format(i) for i in range(1000)]
+        cands = DataFrame(
+            {
+                "bonica.rid": rng.choice(rids, 3000),
+                "cycle": rng.choice([2014, 2016, 2018], 3000),
+                "name": "CANDIDATE",
+            }
+        )
+        with sqlite3.connect(db) as conn:
+            cands.to_sql("candDB", conn, index=False)
+
+        # spawn, so each process's peak RSS is its own
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        for backend in ["sqlite", "parquet"]:
+            with context.Pool(1) as pool:
+                results[backend] = pool.apply(run_ninety_days, (tmp, backend))
+        sizes = {
+            "sqlite": os.path.getsize(db),
+            "parquet": sum(
+                os.path.getsize(os.path.join(folder, name))
+                for folder, _, names in os.walk(os.path.join(tmp, "contribDB.parquet"))
+                for name in names
+            ),
+        }
+
+    keys = ["bonica.rid", "cycle", "name"]
+    old, new = [
+        results[backend][0].sort_values(keys).reset_index(drop=True)
+        for backend in ["sqlite", "parquet"]
+    ]
+    # The sums can differ in their last bits, as they're added up in another order
+    pd.testing.assert_frame_equal(old, new, check_exact=False, rtol=1e-9)
+    report("ninety_days", results["sqlite"][1], results["parquet"][1], rows)
+    for backend in ["sqlite", "parquet"]:
+        print(
+            "ninety_days ({0}): peak RSS +{1:.0f}MB, read {2:.1f}MB of "
+            "{3:.1f}MB".format(
+                backend,
+                results[backend][2],
+                results[backend][3] / 1e6,
+                sizes[backend] / 1e6,
+            )
+        )
+
+
+def bench_handoff(rows: int):
+    """
+    Loading a DIME-shaped hand-off (a few dozen columns of names, IDs, codes and
+    totals) from CSV as before vs. from its Parquet copy, all of it and just the
+    columns the crosswalk needs.
+    """
+    rng = np.random.default_rng(0)
+    names = np.array(LAST_NAMES, dtype=object)
+    data = {
+        "rid": np.char.add("cand", rng.integers(1000, 200000, rows).astype(str)),
+        "cycle": rng.choice([2014, 2016, 2018], rows),
+        "district": rng.choice(np.array(["CA12", "TX01", "VT01", "NY03"]), rows),
+        "name": rng.choice(names, rows),
+        "lname": rng.choice(names, rows),
+        "ffname": rng.choice(names, rows),
+        "Cand.ID": np.char.add("H8CA", rng.integers(10000, 99999, rows).astype(str)),
+        "party": rng.choice([100, 200, 328], rows),
+        "Incum.Chall": rng.choice(np.array(["I", "C", "O"]), rows),
+    }
+    for i in range(30):
+        data["total_{0}".format(i)] = rng.random(rows) * 1e6
+    df = DataFrame(data)
+    columns = ["rid", "cycle", "district", "name", "lname", "ffname"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dime_with_primaries.csv")
+        handoff.write_frame(df, path, index=False)
+        old, old_seconds = timed(pd.read_csv, path)
+        new, new_seconds = timed(handoff.read_frame, path)
+        pd.testing.assert_frame_equal(old, new)
+        report("handoff (all columns)", old_seconds, new_seconds, rows)
+        old, old_seconds = timed(pd.read_csv, path, usecols=columns)
+        new, new_seconds = timed(handoff.read_frame, path, columns=columns)
+        pd.testing.assert_frame_equal(old, new)
+        report(
+            "handoff ({0} columns)".format(len(columns)), old_seconds, new_seconds, rows
+        )
+        print(
+            "handoff: CSV {0:.1f}MB, Parquet {1:.1f}MB".format(
+                os.path.getsize(path) / 1e6,
+                os.path.getsize(handoff.parquet_path(path)) / 1e6,
+            )
+        )
+
+
+ROWS_PER_PAGE = 50
+
+
+def synthetic_filing(rows: int, consecutive: bool = False, seed: int = 0):
+    """
+    A Schedule A of `rows` rows with ROWS_PER_PAGE rows to a page, the way the
+    parser reads one: every so often a row's value is cut off at the bottom of
+    a page (and continued in the first row of the next), or an asset's name runs
+    on into a row of its own at the top of the next page. With consecutive, it
+    can run on into several.
+    """
+    rng = np.random.default_rng(seed)
+    table = pfd_extract.Table("schedule a", 'assets and "unearned" income')
+    page = 1
+    while len(table.rows) < rows:
+        on_page = 0
+        if page > 1 and table.rows[-1]["value-of-asset"].endswith("-"):
+            # The rest of the row cut off at the bottom of the last page
+            table.rows.append({"page": page, "asset": "(rest)", "owner": "SP"})
+            on_page += 1
+        elif page > 1 and rng.random() < 0.4:
+            for _ in range(rng.integers(2, 4) if consecutive else 1):
+                table.rows.append({"page": page, "asset": "[ST]"})
+                on_page += 1
+        while on_page < ROWS_PER_PAGE:
+            value = "$1,001 - $15,000"
+            if on_page == ROWS_PER_PAGE - 1 and rng.random() < 0.2:
+                value = "$1,001 -"
+            table.rows.append(
+                {
+                    "page": page,
+                    "asset": "Asset {0}".format(len(table.rows)),
+                    "value-of-asset": value,
+                    "income-type(s)": "Dividends",
+                }
+            )
+            on_page += 1
+        page += 1
+    table.rows = table.rows[:rows]
+    # (There's nothing to continue the last row.)
+    if "value-of-asset" in table.rows[-1]:
+        table.rows[-1]["value-of-asset"] = "$1,001 - $15,000"
+    return table
+
+
+def legacy_fix_rows(table, file_name: str):
+    """
+    fixRowsThatCrossPages as it was, with a list of the rows to delete that's
+    searched for every row (and turned into a set for every row when they're
+    filtered out).
+    """
+    rows = table.rows
+    rows_to_delete = []
+    for index, row in enumerate(rows):
+        keys = list(row)
+        if "page" in keys:
+            for key in keys:
+                if isinstance(row[key], str) and row[key].endswith("-"):
+                    next_row = rows[index + 1]
+                    if row["page"] != next_row["page"]:
+                        for k in keys:
+                            suffix = " " + str(next_row[k]) if k in next_row else ""
+                            row[k] = str(row[k]) + suffix
+                        rows_to_delete.append(index + 1)
+            if len(keys) <= 2 and index not in rows_to_delete:
+                previous = rows[index - 1]
+                if row["page"] != previous["page"]:
+                    for k in keys:
+                        previous[k] = (
+                            str(previous.get(k, "undefined")) + " " + str(row[k])
+                        )
+                    if index not in rows_to_delete:
+                        rows_to_delete.append(index)
+        row["file"] = file_name
+    table.rows = [
+        row for index, row in enumerate(rows) if index not in list(set(rows_to_delete))
+    ]
+    return table
+
+
+def bench_page_rows(rows: int):
+    """
+    Merging the rows of a synthetic Schedule A that were split by page breaks
+    back together (10k rows is 200 pages), the old way vs. in one pass. Then in
+    one pass again, with several rows at the top of some pages that all
+    continue the row before.
+    """
+    old, old_seconds = timed(legacy_fix_rows, synthetic_filing(rows), "10000001")
+    new, new_seconds = timed(
+        pfd_extract.fix_rows_that_cross_pages, synthetic_filing(rows), "10000001"
+    )
+    assert old.rows == new.rows
+    report("page_rows", old_seconds, new_seconds, rows)
+
+    table = synthetic_filing(rows, consecutive=True)
+    continuing = sum(
+        row["asset"] in ["(rest)", "[ST]"] and row["page"] > 1 for row in table.rows
+    )
+    fixed, seconds = timed(pfd_extract.fix_rows_that_cross_pages, table, "10000001")
+    assert len(fixed.rows) == rows - continuing
+    print(
+        "page_rows (consecutive): {0} rows, {1} merged, {2:.3f}s".format(
+            rows, continuing, seconds
+        )
+    )
+
+
+BENCHMARKS = {
+    "backends": bench_backends,
+    "corrections": bench_corrections,
+    "crosswalk": bench_crosswalk,
+    "disclosures": bench_disclosures,
+    "download": bench_download,
+    "fuzzy": bench_fuzzy,
+    "features": bench_features,
+    "handoff": bench_handoff,
+    "normalize": bench_normalize,
+    "page_rows": bench_page_rows,
+    "parse_cache": bench_parse_cache,
+    "ranges": bench_ranges,
+    "sqlite": bench_sqlite,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks.")
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help="Which benchmarks to run, out of {0} (default: all of them)".format(
+            ", ".join(sorted(BENCHMARKS))
+        ),
+    )
+    parser.add_argument(
+        "--rows", type=int, default=100000, help="Size of the synthetic inputs"
+    )
+    args = parser.parse_args()
+    # Not choices=, which rejects an empty list of them
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if len(unknown) > 0:
+        parser.error("unknown benchmarks: {0}".format(", ".join(unknown)))
+
+    if instrument.REPORT_PATH != "":
+        # Reports (and profiles) of the stages the benchmarks call go in a
+        # folder of their own, never in the data root's, including those of
+        # the processes they spawn
+        instrument.REPORT_PATH = tempfile.mkdtemp(prefix="benchmark-reports-")
+        os.environ["DDRL_REPORTS"] = instrument.REPORT_PATH
+        print("Stage reports go in {0}".format(instrument.REPORT_PATH))
+
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name](args.rows)
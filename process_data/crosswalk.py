@@ -1,7 +1,16 @@
 # Script to create a crosswalk file matching candidate-year entries to PFD documents.
+# `python crosswalk.py --fuzzy` also fuzzy-matches the names exact matching can't
+# settle (see name_matching.py); the crosswalk then says how each row was matched.
+import argparse
+
 import pandas as pd
-import numpy as np
-from unidecode import unidecode
+
+from manifest_store import NAME_FIELDS, NORMALIZED_FIELDS, load_manifest
+from name_matching import rank_candidates, resolve
+from handoff import read_frame, write_frame
+from instrument import record_rows, stage
+from normalize import fix_at_large, last_names, normalize_names
+from paths import data_path
 
 YEARS = [2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020]
 
@@ -9,9 +18,10 @@ YEARS = [2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020]
 def get_pfd_manifest() -> pd.DataFrame:
     year_dfs = []
     for year in YEARS:
-        df_year = pd.read_csv(
-            "../data/pfd/manifests/{year}FD.txt".format(year=year), delimiter="\t"
-        )
+        df_year = load_manifest(year)
+        # The stored manifests come with the name fields already normalized
+        for name_field, normalized in zip(NAME_FIELDS, NORMALIZED_FIELDS):
+            df_year[name_field] = df_year.pop(normalized)
         # Rename fields to be nicer
         df_year.rename(
             columns={
@@ -31,29 +41,14 @@ def get_pfd_manifest() -> pd.DataFrame:
         df_year["cycle"] = year + (year % 2)
         year_dfs.append(df_year)
 
-    df_manifest = pd.concat(year_dfs)
-    # Some cleanup and filtering:
-    df_manifest = df_manifest.astype(
-        {"pfd_id": np.int32, "last": str, "first": str, "prefix": str, "suffix": str}
+    df_manifest = pd.concat(year_dfs).astype(
+        {"filing_type": "category", "district": "category"}
     )
+    # Some cleanup and filtering:
     df_manifest.drop_duplicates(inplace=True)
     df_manifest = df_manifest[df_manifest["filing_type"].isin(["C", "O"])]
     # At-large districts are 00 in PFD and 01 in DIME:
-    def fix_district(row):
-        if row["district"][-2:] == "00":
-            return row["district"][:-2] + "01"
-        return row["district"]
-
-    df_manifest["district"] = df_manifest.apply(fix_district, axis=1)
-
-    # Normalize data
-    for name_field in ["prefix", "last", "first", "suffix"]:
-        df_manifest[name_field] = (
-            df_manifest[name_field]
-            .str.upper()
-            .apply(unidecode)
-            .str.replace(r"[- ]", "")
-        )
+    df_manifest["district"] = fix_at_large(df_manifest["district"])
 
     # We might want a more comprehensive crosswalk at some point,
     # but for now I'm subsetting to just the ones we have digital PFDs for
@@ -65,8 +60,6 @@ def get_pfd_manifest() -> pd.DataFrame:
 
 
 def get_dime_manifest():
-    df_dime = pd.read_csv("../data/dime_with_primaries.csv")
-
     name_fields = [
         "name",
         "lname",
@@ -77,9 +70,12 @@ def get_dime_manifest():
         "title",
         "suffix",
     ]
-    for name_field in name_fields:
-        df_dime[name_field] = df_dime[name_field].str.upper().str.replace(r"[- ]", "")
-    df_dime["llname"] = df_dime["name"].apply(lambda x: x.split(",")[0])
+    df_dime = read_frame(
+        data_path("dime_with_primaries.csv"),
+        columns=["rid", "cycle", "district"] + name_fields,
+    )
+    df_dime[name_fields] = normalize_names(df_dime, name_fields)
+    df_dime["llname"] = last_names(df_dime["name"])
 
     df_dime = df_dime[["rid", "cycle", "district", "llname"] + name_fields]
     return df_dime
@@ -87,100 +83,167 @@ def get_dime_manifest():
 
 no_match = 0
 too_many_match = 0
+fuzzy_match = 0
 missing_districts = set()
 
 
-def create_crosswalk(df_manifest, df_dime):
+def index_dime_blocks(df_dime):
+    """
+    Group the DIME candidates into blocks by (district, cycle) and by
+    (state, cycle), keeping their order in df_dime within each block, so that a
+    manifest row only has to be compared against the candidates in its block.
+    """
+    by_district = {}
+    by_state = {}
+    for cand in df_dime[
+        ["rid", "cycle", "district", "lname", "ffname", "nname", "llname"]
+    ].itertuples(index=False):
+        by_district.setdefault((cand.district, cand.cycle), []).append(cand)
+        if isinstance(cand.district, str):
+            by_state.setdefault((cand.district[:2], cand.cycle), []).append(cand)
+    return by_district, by_state
+
+
+def contains(name, part):
+    # Same as Series.str.contains(part, regex=False), with NaNs never matching
+    return isinstance(name, str) and part in name
+
+
+@stage
+def create_crosswalk(df_manifest, df_dime, fuzzy=False, out_path=data_path("pfd/")):
+    global no_match, too_many_match, fuzzy_match
+    no_match, too_many_match, fuzzy_match = 0, 0, 0
+    missing_districts.clear()
+    by_district, by_state = index_dime_blocks(df_dime)
+    candidate_rows = []
+
+    def fuzzy_match_rid(row, result):
+        """
+        For a row the exact matching couldn't settle, rank the candidates in its
+        block by name similarity (keeping the ranking for manual review), and
+        take the best one if it's a clear winner.
+        """
+        global no_match, too_many_match, fuzzy_match
+        ranked = rank_candidates(
+            row.last, row.first, by_district.get((row.district, row.cycle), [])
+        )
+        for rank, (score, cand) in enumerate(ranked):
+            candidate_rows.append(
+                {
+                    "pfd_id": row.pfd_id,
+                    "cycle": row.cycle,
+                    "exact_rid": result["rid"],
+                    "rank": rank + 1,
+                    "rid": cand.rid,
+                    "score": round(score, 4),
+                }
+            )
+        rid = resolve(ranked)
+        if rid is None or rid == "dupe":
+            return result
+        if result["rid"] == "missing":
+            no_match -= 1
+        elif result["rid"] == "dupe" and row.cycle != 2020:
+            too_many_match -= 1
+        fuzzy_match += 1
+        result["rid"] = rid
+        result["match_method"] = "fuzzy"
+        return result
+
     def find_matching_rid(row):
         global too_many_match
-        result = {"pfd_id": row["pfd_id"], "cycle": row["cycle"], "rid": None}
-
-        df_candidate_set = df_dime[
-            (df_dime["district"] == row["district"])
-            & (df_dime["cycle"] == row["cycle"])
-            & df_dime["lname"].str.contains(row["last"], regex=False)
-        ]
-        # df_candidate_set = df_dime[
-        #     (df_dime["district"] == row["district"])
-        #     & (df_dime["cycle"] == row["cycle"])
-        # ]
-        # reverse_match = df_candidate_set.apply(
-        #     lambda r: r["lname"] in row["last"], axis=1
-        # )
-        # df_candidate_set = df_candidate_set[
-        #     df_candidate_set["lname"].str.contains(row["last"], regex=False)
-        #     | df_candidate_set["llname"].str.contains(row["last"], regex=False)
-        #     | reverse_match
+        result = {"pfd_id": row.pfd_id, "cycle": row.cycle, "rid": None}
+        block = by_district.get((row.district, row.cycle), [])
+
+        candidate_set = [c for c in block if contains(c.lname, row.last)]
+        # candidate_set = [
+        #     c
+        #     for c in block
+        #     if contains(c.lname, row.last)
+        #     or contains(c.llname, row.last)
+        #     or contains(row.last, c.lname)
         # ]
 
-        if len(df_candidate_set) == 1:
-            result["rid"] = df_candidate_set.iloc[0]["rid"]
-        elif len(df_candidate_set) == 0:
+        if len(candidate_set) == 1:
+            result["rid"] = candidate_set[0].rid
+        elif len(candidate_set) == 0:
             matched = False
-            # if row["district"][:2] == "PA":
+            # if row.district[:2] == "PA":
             # Try matching over entire state (PA, TX observed)
-            df_candidate_set = df_dime[
-                (df_dime.district.str[:2] == row["district"][:2])
-                & (df_dime["cycle"] == row["cycle"])
-                & df_dime["lname"].str.contains(row["last"], regex=False)
-                & df_dime["ffname"].str.contains(row["first"], regex=False)
+            candidate_set = [
+                c
+                for c in by_state.get((row.district[:2], row.cycle), [])
+                if contains(c.lname, row.last) and contains(c.ffname, row.first)
             ]
-            if len(df_candidate_set) == 1:
+            if len(candidate_set) == 1:
                 matched = True
-                result["rid"] = df_candidate_set.iloc[0]["rid"]
+                result["rid"] = candidate_set[0].rid
 
             if not matched:
                 # Try matching on first name instead
-                df_candidate_set = df_dime[
-                    (df_dime["district"] == row["district"])
-                    & (df_dime["cycle"] == row["cycle"])
-                    & df_dime["ffname"].str.contains(row["first"], regex=False)
-                ]
-                if len(df_candidate_set) == 1:
+                candidate_set = [c for c in block if contains(c.ffname, row.first)]
+                if len(candidate_set) == 1:
                     matched = True
-                    result["rid"] = df_candidate_set.iloc[0]["rid"]
+                    result["rid"] = candidate_set[0].rid
 
-            if not matched and row["cycle"] <= 2018:
+            if not matched and row.cycle <= 2018:
                 global no_match
                 no_match += 1
-                missing_districts.add(row["district"])
+                missing_districts.add(row.district)
                 result["rid"] = "missing"
         else:
             # print("Too many matches!", row)
-            # print(df_candidate_set)
-            df_candidate_set = df_dime[
-                (df_dime["district"] == row["district"])
-                & (df_dime["cycle"] == row["cycle"])
-                & df_dime["lname"].str.contains(row["last"], regex=False)
-                & df_dime["ffname"].str.contains(row["first"], regex=False)
-            ]
-            if len(df_candidate_set) > 1 and row["cycle"] <= 2018:
+            # print(candidate_set)
+            candidate_set = [c for c in candidate_set if contains(c.ffname, row.first)]
+            if len(candidate_set) > 1 and row.cycle <= 2018:
                 if row.cycle != 2020:
                     too_many_match += 1
                 # TODO: matching for now so we can just look at missing; disambiguate later
-                result["rid"] = "dupe"  # df_candidate_set.iloc[0]["rid"]
-            elif len(df_candidate_set) == 0:
+                result["rid"] = "dupe"  # candidate_set[0].rid
+            elif len(candidate_set) == 0:
                 # This means we matched on too many by last name, but nothing by first...
                 pass
                 if row.cycle != 2020:
                     too_many_match += 1
                 # TODO: matching for now so we can just look at missing; disambiguate later
-                result["rid"] = "dupe"  # df_candidate_set.iloc[0]["rid"]
+                result["rid"] = "dupe"  # candidate_set[0].rid
             else:
-                result["rid"] = df_candidate_set.iloc[0]["rid"]
+                result["rid"] = candidate_set[0].rid
         if result["rid"] is None and row.cycle != 2020:
             print(row)
-            print(df_candidate_set)
+            print(candidate_set)
             raise ValueError
-        return pd.Series(result)
+        if result["rid"] not in [None, "missing", "dupe"]:
+            result["match_method"] = "exact"
+        elif fuzzy:
+            result = fuzzy_match_rid(row, result)
+        return result
 
     # One candidate-cycle may have multiple filings, so we should have a m:1 mapping
-    # So we need to match from df_manifest
-    df_crosswalk = df_manifest.apply(find_matching_rid, axis=1)
-    df_crosswalk.to_csv("../data/pfd/crosswalk.csv")
+    # So we need to match from df_manifest. With fuzzy matching, match_method
+    # (exact, fuzzy, or blank for rows without a match) says how each row was
+    # matched, so the fuzzy ones can be checked or left out.
+    df_crosswalk = pd.DataFrame(
+        [
+            find_matching_rid(row)
+            for row in df_manifest[
+                ["pfd_id", "cycle", "district", "last", "first"]
+            ].itertuples(index=False)
+        ],
+        columns=["pfd_id", "cycle", "rid"] + (["match_method"] if fuzzy else []),
+        index=df_manifest.index,
+    )
+    write_frame(df_crosswalk, out_path + "crosswalk.csv")
+    if fuzzy:
+        # Ranked candidates for every row that needed fuzzy matching
+        pd.DataFrame(
+            candidate_rows,
+            columns=["pfd_id", "cycle", "exact_rid", "rank", "rid", "score"],
+        ).to_csv(out_path + "crosswalk_candidates.csv", index=False)
     print(
         len(df_manifest) - no_match - too_many_match,
         "matched",
+        "({0} by fuzzy matching),".format(fuzzy_match),
         no_match,
         "no matches,",
         too_many_match,
@@ -190,9 +253,10 @@ def create_crosswalk(df_manifest, df_dime):
     return df_crosswalk
 
 
+@stage
 def apply_crosswalk(df_crosswalk):
-    pfd_final = pd.read_csv("../data/pfd/pfd_final.csv")
-    df_dime = pd.read_csv("../data/dime_with_primaries.csv")
+    pfd_final = read_frame(data_path("pfd/pfd_final.csv"))
+    df_dime = read_frame(data_path("dime_with_primaries.csv"))
     df_final = pd.merge(
         df_crosswalk, pfd_final, how="right", left_on="pfd_id", right_on="file"
     )
@@ -211,16 +275,23 @@ def apply_crosswalk(df_crosswalk):
         right_on=["rid", "cycle"],
     )
     df_final.dropna(subset=["rid"], inplace=True)
+    record_rows(rows_out=len(df_final))
 
-    df_final.to_csv("../data/merged_data.csv")
+    write_frame(df_final, data_path("merged_data.csv"))
 
 
-def main():
+def main(fuzzy: bool = False):
     df_manifest = get_pfd_manifest()
     df_dime = get_dime_manifest()
-    df_crosswalk = create_crosswalk(df_manifest, df_dime)
+    df_crosswalk = create_crosswalk(df_manifest, df_dime, fuzzy=fuzzy)
     apply_crosswalk(df_crosswalk)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create and apply the crosswalk.")
+    parser.add_argument(
+        "--fuzzy",
+        action="store_true",
+        help="Fuzzy-match the names that exact matching leaves unmatched",
+    )
+    main(parser.parse_args().fuzzy)
@@ -0,0 +1,97 @@
+# Applies the hand-made corrections in corrections.csv to the DIME candidates.
+# Each rule drops the rows whose `column` (Cand.ID, rid or name) is `value` in
+# `cycle` (or in every cycle, if that's blank), replaces that value with
+# `new_value`, or sets some other `field` of those rows to `new_value`.
+import os
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corrections.csv")
+ACTIONS = ["drop", "replace", "set"]
+KEY_COLUMNS = ["Cand.ID", "rid", "name"]
+
+
+def load_rules(path: str = RULES_PATH) -> DataFrame:
+    """
+    The rule table, numbered by its line in the file. A replace is turned into
+    a set of the key column itself.
+    """
+    rules = pd.read_csv(path, dtype=str, keep_default_na=False)
+    rules.index = pd.RangeIndex(2, len(rules) + 2, name="line")
+    bad = rules[~rules["action"].isin(ACTIONS) | ~rules["column"].isin(KEY_COLUMNS)]
+    bad = bad.index.append(
+        rules[(rules["action"] == "set") & (rules["field"] == "")].index
+    )
+    if len(bad) > 0:
+        raise ValueError(
+            "Bad rules in {0} on lines {1}".format(path, ", ".join(map(str, bad)))
+        )
+    # Blank cycles become NaN, which never equals a row's cycle
+    rules["cycle"] = pd.to_numeric(rules["cycle"].mask(rules["cycle"] == ""))
+    replace = rules["action"] == "replace"
+    rules.loc[replace, "field"] = rules.loc[replace, "column"]
+    return rules
+
+
+def match_rules(df: DataFrame, rules: DataFrame) -> DataFrame:
+    """
+    Every (row, line) pair of a row of df (by position) and a rule matching it,
+    ordered by rule. It's one join per key column, however many rules and
+    cycles there are.
+    """
+    rows = DataFrame({"row": np.arange(len(df)), "row_cycle": df["cycle"].to_numpy()})
+    matches = []
+    for column, column_rules in rules.groupby("column", sort=False):
+        matched = rows.assign(value=df[column].to_numpy(dtype=object)).merge(
+            column_rules[["value", "cycle"]].reset_index(), on="value"
+        )
+        matched = matched[
+            matched["cycle"].isna() | (matched["cycle"] == matched["row_cycle"])
+        ]
+        matches.append(matched[["row", "line"]])
+    if len(matches) == 0:
+        return DataFrame({"row": [], "line": []}, dtype=np.int64)
+    return pd.concat(matches).sort_values(["line", "row"], ignore_index=True)
+
+
+def apply_corrections(df: DataFrame, rules: DataFrame):
+    """
+    Apply all of the rules to df in one go. Every rule is matched against df as
+    it came in, so a rule never sees what another one changed; when several
+    rules set the same field of a row, the one furthest down the file wins.
+
+    Returns the corrected df, and the audit trail: which rows (by rid, Cand.ID
+    and cycle, as they came in) each rule touched.
+    """
+    matches = match_rules(df, rules).join(
+        rules[["action", "field", "new_value"]], on="line"
+    )
+    audit = matches.join(
+        df[["rid", "Cand.ID", "cycle"]].reset_index(drop=True), on="row"
+    ).join(rules[["column", "value"]], on="line")
+
+    df = df.copy()
+    sets = matches[matches["action"] != "drop"]
+    for field, field_sets in sets.groupby("field", sort=False):
+        field_sets = field_sets.drop_duplicates("row", keep="last")
+        df.iloc[field_sets["row"], df.columns.get_loc(field)] = field_sets[
+            "new_value"
+        ].to_numpy()
+    dropped = matches.loc[matches["action"] == "drop", "row"]
+    df = df[~np.isin(np.arange(len(df)), dropped)]
+
+    unused = rules.index.difference(audit["line"])
+    print(
+        "Corrections: {0} rows dropped, {1} fields changed by {2} rules".format(
+            dropped.nunique(), len(sets), len(rules)
+        )
+    )
+    if len(unused) > 0:
+        print("Rules that didn't match anything (lines):", ", ".join(map(str, unused)))
+    audit = audit[
+        ["line", "action", "column", "value", "field", "new_value"]
+        + ["row", "rid", "Cand.ID", "cycle"]
+    ]
+    return df, audit
@@ -17,6 +17,10 @@ import csv
 import sqlite3
 import bz2
 import gzip
+import itertools
+import operator
+import os
+import time
 from six import string_types, text_type
 
 if sys.version_info[0] > 2:
@@ -24,6 +28,20 @@ if sys.version_info[0] > 2:
 else:
     read_mode = "rU"
 
+PRAGMA_PROFILES = {
+    # SQLite's own settings: a crash mid-load leaves the database intact.
+    "default": {},
+    # Much faster for the big loads, but without a rollback journal a crash
+    # mid-load can corrupt the database file, so only use it on a file that
+    # can be rebuilt from scratch.
+    "bulk": {
+        "journal_mode": "OFF",
+        "synchronous": "OFF",
+        "cache_size": -1048576,
+        "locking_mode": "EXCLUSIVE",
+    },
+}
+
 
 def convert(
     filepath_or_fileobj,
@@ -32,7 +50,20 @@ def convert(
     headerspath_or_fileobj=None,
     compression=None,
     typespath_or_fileobj=None,
+    batch_size=100000,
+    pragmas=None,
+    parquet_path=None,
 ):
+    """Load a CSV file into a table in a SQLite database, inserting the rows in
+    batches of batch_size and committing after each one.
+    :param pragmas: PRAGMA settings to use for the load, as a dict; defaults to
+        the "default" entry of PRAGMA_PROFILES.
+    :param parquet_path: if given, the rows are also written to a Parquet
+        dataset there, partitioned by cycle and seat (see parquet_store.py).
+        Pass dbpath=None to only write the Parquet dataset.
+    """
+    if pragmas is None:
+        pragmas = PRAGMA_PROFILES["default"]
     if isinstance(filepath_or_fileobj, string_types):
         if compression is None:
             fo = open(filepath_or_fileobj, mode=read_mode, errors="ignore")
@@ -94,16 +125,26 @@ def convert(
     if not header_given:  # Skip the header
         next(reader)
 
-    conn = sqlite3.connect(dbpath)
-    # shz: fix error with non-ASCII input
-    conn.text_factory = str
-    c = conn.cursor()
+    if dbpath is not None:
+        conn = sqlite3.connect(dbpath)
+        # shz: fix error with non-ASCII input
+        conn.text_factory = str
+        c = conn.cursor()
+        for pragma, value in pragmas.items():
+            c.execute("PRAGMA %s = %s" % (pragma, value))
 
-    try:
-        create_query = "CREATE TABLE %s (%s)" % (table, _columns)
-        c.execute(create_query)
-    except:
-        pass
+        try:
+            create_query = "CREATE TABLE %s (%s)" % (table, _columns)
+            c.execute(create_query)
+        except:
+            pass
+
+    if parquet_path is not None:
+        from parquet_store import ParquetPartitionWriter
+
+        # Named after the input, so that reloading a file replaces its rows
+        name = os.path.basename(str(filepath_or_fileobj)).split(".")[0] or table
+        parquet_writer = ParquetPartitionWriter(parquet_path, name, headers, types)
 
     _insert_tmpl = "INSERT INTO %s VALUES (%s)" % (
         table,
@@ -111,40 +152,171 @@ def convert(
     )
 
     print(
-        "here we go! There are about 63 million rows in contribDB; printing every 100,000"
+        "here we go! There are about 63 million rows in contribDB; printing every %d"
+        % batch_size
     )
-    line = 0
-    for row in reader:
-        line += 1
-        if line % 100000 == 0:
-            print(line / 1000000, "million processed")
-        if len(row) == 0:
-            continue
-        # we need to take out commas from int and floats for sqlite to
-        # recognize them properly ...
+    start = time.time()
+    loaded = 0
+    for batch in _batches(reader, types, batch_size):
+        first_row = loaded + 1
+        if parquet_path is not None:
+            # Both writers need the rows, so they can't just be streamed through
+            batch = list(batch)
+            parquet_writer.write(batch)
+            loaded += len(batch)
+        if dbpath is not None:
+            inserted = _insert_rows(c, _insert_tmpl, batch, first_row)
+            conn.commit()
+            if parquet_path is None:
+                loaded += inserted
+        elapsed = time.time() - start
+        print(
+            "%s million processed (%d rows/s)"
+            % (loaded / 1000000, loaded / elapsed if elapsed > 0 else 0)
+        )
+
+    if parquet_path is not None:
+        parquet_writer.close()
+    if dbpath is not None:
+        conn.commit()
+        c.close()
+        # Releases the lock, which the "bulk" profile otherwise holds onto.
+        conn.close()
+    fo.close()
+
+
+def _batches(reader, types, batch_size):
+    """Convert the rows of reader in batches of batch_size rows. The rows are
+    streamed straight from the reader into executemany rather than collected
+    into lists first, which keeps memory (and GC) overhead flat.
+    """
+    rows = _convert_rows(reader, types)
+    for first_row in rows:
+        yield itertools.chain([first_row], itertools.islice(rows, batch_size - 1))
+
+
+def _to_real(x):
+    # we need to take out commas from int and floats for sqlite to
+    # recognize them properly ...
+    return None if x == "" else float(x.replace(",", ""))
+
+
+def _to_integer(x):
+    return None if x == "" else int(x)
+
+
+def _to_text(x):
+    return None if x == "" else x
+
+
+_converters = {"real": _to_real, "integer": _to_integer}
+
+
+def _row_converter(types):
+    """A function that converts a whole row to the column types, the same way
+    as the _to_* converters but without a call for every cell. Like indexing the
+    row, it raises IndexError if the row has too few values.
+    """
+    cells = operator.itemgetter(*range(len(types)))
+    if len(types) == 1:
+        cells = lambda row, cell=cells: (cell(row),)
+    integers = [i for (i, _type) in enumerate(types) if _type == "integer"]
+    reals = [i for (i, _type) in enumerate(types) if _type == "real"]
+    texts = [i for (i, _type) in enumerate(types) if _type not in _converters]
+
+    def convert_row(row):
+        values = list(cells(row))
+        for i in integers:
+            values[i] = int(values[i]) if values[i] else None
+        for i in reals:
+            # we need to take out commas from int and floats for sqlite to
+            # recognize them properly ...
+            values[i] = float(values[i].replace(",", "")) if values[i] else None
+        for i in texts:
+            if not values[i]:
+                values[i] = None
+        return values
+
+    return convert_row
+
+
+def _insert_rows(c, insert, rows, first_row):
+    """executemany the rows, skipping (and reporting on stderr) any row SQLite
+    won't take, as inserting them one at a time always did. A failure before any
+    row has gone in, like a table with the wrong number of columns, is raised.
+    Returns how many rows were inserted; first_row is the number of the first one
+    in the whole load, for the error messages.
+    """
+    taken = [0, None]
+
+    def tracked():
+        for row in rows:
+            taken[0] += 1
+            taken[1] = row
+            yield row
+
+    remaining = tracked()
+    failed = 0
+    while True:
+        before = taken[0]
         try:
-            row = [
-                None
-                if x == ""
-                else float(x.replace(",", ""))
-                if y == "real"
-                else int(x)
-                if y == "integer"
-                else x
-                for (x, y) in zip(row, types)
-            ]
-            c.execute(_insert_tmpl, row)
-        except ValueError as e:
-            print(row)
+            # Carries on from where the last attempt stopped
+            c.executemany(insert, remaining)
+            return taken[0] - failed
+        except (sqlite3.Error, OverflowError) as e:
+            if taken[0] == before:
+                raise
+            failed += 1
+            print(taken[1])
             print(
-                "Unable to convert value '%s' to type '%s' on line %d" % (x, y, line),
+                "Error inserting row %d: %s" % (first_row + taken[0] - 1, e),
                 file=sys.stderr,
             )
-        except Exception as e:
-            print("Error on line %d: %s" % (line, e), file=sys.stderr)
 
-    conn.commit()
-    c.close()
+
+def _report(line, row, message):
+    """Print a problem with a row (message has a %d for the line number), along
+    with the row itself if given.
+    """
+    if row is not None:
+        print(row)
+    print(message % line, file=sys.stderr)
+
+
+def _convert_rows(reader, types):
+    """Convert each CSV row to the given column types, skipping (and reporting
+    on stderr) the rows that can't be converted or have too few values.
+    :param reader: csv reader positioned at the first data row.
+    """
+    convert_row = _row_converter(types)
+    line = 0
+    for row in reader:
+        line += 1
+        try:
+            yield convert_row(row)
+        except IndexError:
+            if len(row) == 0:
+                continue
+            # Caught here, since one bad row would fail the whole batch insert
+            _report(
+                line,
+                None,
+                "Error on line %%d: Incorrect number of bindings supplied. The "
+                "current statement uses %d, and there are %d supplied."
+                % (len(types), len(row)),
+            )
+        except ValueError:
+            for x, y in zip(row, types):
+                try:
+                    _converters.get(y, _to_text)(x)
+                except ValueError:
+                    break
+            _report(
+                line,
+                row,
+                "Unable to convert value '%s' to type '%s' on line %%d"
+                % (x.replace("%", "%%"), y),
+            )
 
 
 def _guess_types(reader, number_of_columns, max_sample_size=100):
@@ -234,6 +406,38 @@ The database is created if it does not yet exist.
         default=None,
     )
 
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="Number of rows to insert (and commit) at a time.",
+        default=100000,
+    )
+    parser.add_argument(
+        "--parquet",
+        type=str,
+        help="Also write the rows to a Parquet dataset in this folder, partitioned "
+        "by cycle and seat.",
+        default=None,
+    )
+    parser.add_argument(
+        "--parquet-only",
+        help="Only write the Parquet dataset, leaving the SQLite file alone.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PRAGMA_PROFILES),
+        help="Set of PRAGMA settings to use for the load.",
+        default="default",
+    )
+    parser.add_argument(
+        "--pragma",
+        action="append",
+        metavar="NAME=VALUE",
+        help="Override a single PRAGMA setting of the profile; may be repeated.",
+        default=[],
+    )
+
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
         "--bz2", help="Input csv file is compressed using bzip2.", action="store_true"
@@ -250,12 +454,20 @@ The database is created if it does not yet exist.
     elif args.gzip:
         compression = "gzip"
 
+    pragmas = dict(PRAGMA_PROFILES[args.profile])
+    for pragma in args.pragma:
+        name, value = pragma.split("=", 1)
+        pragmas[name.strip()] = value.strip()
+
     convert(
         args.csv_file,
-        args.sqlite_db_file,
+        None if args.parquet_only else args.sqlite_db_file,
         args.table_name,
         args.headers,
         compression,
         args.types,
+        args.batch_size,
+        pragmas,
+        args.parquet,
     )
 
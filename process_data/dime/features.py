@@ -0,0 +1,154 @@
+# Per-campaign features out of the primary contributions: totals, counts, donor
+# counts and small-dollar and in-state shares, over the whole primary or some
+# number of days after the campaign's first contribution. However many features
+# are asked for, the contributions are only read (in date order) once.
+from collections import namedtuple
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# metric is one of METRICS, and days the window after the first contribution
+# (None for the whole primary)
+Feature = namedtuple("Feature", ["name", "metric", "days"])
+METRICS = ["total", "count", "donors", "small_share", "in_state_share"]
+# Contributions up to this much count as small-dollar ones (the FEC's
+# itemization threshold)
+SMALL_DOLLAR = 200
+
+FEATURES = [
+    Feature("contributions_primary", "count", None),
+    Feature("donors_primary", "donors", None),
+    Feature("small_share_primary", "small_share", None),
+    Feature("in_state_share_primary", "in_state_share", None),
+    Feature("contributions_ninety", "count", 90),
+    Feature("donors_ninety", "donors", 90),
+    Feature("small_share_ninety", "small_share", 90),
+    Feature("in_state_share_ninety", "in_state_share", 90),
+]
+
+KEYS = ["cycle", "bonica.rid"]
+# What the features are computed from
+COLUMNS = KEYS + [
+    "date",
+    "amount",
+    "bonica.cid",
+    "contributor.state",
+    "recipient.state",
+]
+
+
+def window_masks(df: DataFrame, codes: np.ndarray, days: Iterable) -> dict:
+    """
+    For each window, which contributions (with the given campaign codes) are in
+    it. Like the campaign totals, a window ends on the day `days` days after
+    the campaign's first dated contribution, inclusive, and contributions
+    without a date are only in the whole primary. The dates are compared as
+    days, not as strings.
+    """
+    masks = {}
+    dates = pd.to_datetime(df["date"], format="%Y-%m-%d", exact=False, errors="coerce")
+    start = dates.groupby(codes).transform("min").to_numpy()
+    dates = dates.to_numpy()
+    for d in days:
+        if d is None:
+            masks[d] = np.ones(len(df), dtype=bool)
+        else:
+            # (NaT is never <= anything)
+            masks[d] = dates <= start + np.timedelta64(d, "D")
+    return masks
+
+
+def chunk_features(df: DataFrame, features: List[Feature]) -> DataFrame:
+    """
+    The features of every campaign in df, which has all of their contributions.
+    The campaigns are numbered once, each feature is a column of masked values,
+    and all of the sums are then done by a single groupby on those numbers.
+    """
+    groups = df.groupby(KEYS, sort=False)
+    codes = groups.ngroup().to_numpy()
+    out = DataFrame(index=groups.size().index)
+    masks = window_masks(df, codes, set(f.days for f in features))
+    amount = df["amount"].to_numpy(dtype=float)
+    small = amount <= SMALL_DOLLAR
+    in_state = (df["contributor.state"] == df["recipient.state"]).to_numpy()
+    donor_codes, donor_ids = pd.factorize(df["bonica.cid"])
+
+    sums = {}
+    donors = {}
+    for f in features:
+        mask = masks[f.days]
+        # Each share is divided by the window's total
+        if f.metric in ["total", "small_share", "in_state_share"]:
+            sums[("total", f.days)] = np.where(mask, amount, np.nan)
+        if f.metric == "count":
+            sums[("count", f.days)] = mask.astype(np.int64)
+        elif f.metric == "small_share":
+            sums[("small", f.days)] = np.where(mask & small, amount, 0)
+        elif f.metric == "in_state_share":
+            sums[("in_state", f.days)] = np.where(mask & in_state, amount, 0)
+        elif f.metric == "donors" and f.days not in donors:
+            # Count each distinct (campaign, donor) pair once
+            known = mask & (donor_codes >= 0)
+            pairs = np.unique(codes[known] * len(donor_ids) + donor_codes[known])
+            donors[f.days] = np.bincount(
+                pairs // max(len(donor_ids), 1), minlength=len(out)
+            )
+
+    # (The columns are numbered, since None can't be a column name)
+    summed = DataFrame(dict(enumerate(sums.values())), index=df.index)
+    # min_count=1, so that a total over no contributions is missing, like SQL
+    summed = summed.groupby(codes).sum(min_count=1)
+    summed = {key: summed[i].to_numpy() for i, key in enumerate(sums)}
+
+    for f in features:
+        if f.metric == "total":
+            # Not rounded, like the totals in campaign_totals
+            out[f.name] = summed[("total", f.days)]
+        elif f.metric == "count":
+            out[f.name] = summed[("count", f.days)].astype(np.int64)
+        elif f.metric == "donors":
+            out[f.name] = donors[f.days]
+        else:
+            part = "small" if f.metric == "small_share" else "in_state"
+            out[f.name] = (
+                np.nan_to_num(summed[(part, f.days)]) / summed[("total", f.days)]
+            ).round(4)
+    return out
+
+
+def campaign_features(
+    chunks: Iterable[DataFrame], features: List[Feature] = FEATURES
+) -> DataFrame:
+    """
+    The features of every (cycle, rid), one row each, from chunks of the
+    primary contributions (with COLUMNS) sorted by cycle, rid and date across
+    chunks. The contributions of the last campaign in a chunk are held back for
+    the next one, so that every campaign is worked out in one go.
+    """
+    for f in features:
+        if f.metric not in METRICS:
+            raise ValueError("Unknown metric {0} for {1}".format(f.metric, f.name))
+    parts = []
+    held_back = None
+    for chunk in chunks:
+        chunk = chunk[chunk["cycle"].notna() & chunk["bonica.rid"].notna()]
+        if held_back is not None:
+            chunk = pd.concat([held_back, chunk], ignore_index=True)
+        if len(chunk) == 0:
+            continue
+        last = (chunk["cycle"] == chunk["cycle"].iloc[-1]) & (
+            chunk["bonica.rid"] == chunk["bonica.rid"].iloc[-1]
+        )
+        held_back = chunk[last]
+        if (~last).any():
+            parts.append(chunk_features(chunk[~last], features))
+    if held_back is not None and len(held_back) > 0:
+        parts.append(chunk_features(held_back, features))
+
+    if len(parts) == 0:
+        return DataFrame(columns=["rid", "cycle"] + [f.name for f in features])
+    df = pd.concat(parts).reset_index()
+    df = df.rename(columns={"bonica.rid": "rid"})
+    return df[["rid", "cycle"] + [f.name for f in features]]
@@ -1,104 +1,177 @@
 # File to download FEC primary election data and merge with DIME's dime_final.csv
+import hashlib
 import pandas as pd
 import os
+import requests
+import sys
+from glob import glob
 
+# The top-level data folder (see ../paths.py), as seen from this folder
+DATA_ROOT = os.environ.get("DDRL_DATA_ROOT", "../../data")
 
-def download_primary_data():
-    """
-    Download the primary election data from the FEC website and put into dataframe.
-    """
-    election_files = [
-        "https://www.fec.gov/documents/1700/federalelections2014.xls",
-        "https://www.fec.gov/documents/1890/federalelections2016.xlsx",
-        "https://www.fec.gov/documents/2706/federalelections2018.xlsx",
-    ]
+# handoff.py is shared with the scripts one folder up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from handoff import read_frame, write_frame
 
-    df_primaries = None
 
-    for election_file in election_files:
-        year = election_file.split(".")[-2][-4:]
-        df_year = pd.read_excel(
-            election_file,
-            sheet_name="{year} US House Results by State".format(year=year),
-            index_col=0,
-        )
-        df_year.rename(
-            columns={
-                "FEC ID#": "Cand.ID",
-                "PRIMARY VOTES": "votes_primary",
-                "PRIMARY %": "pct_primary",
-                "RUNOFF VOTES": "votes_runoff",
-                "RUNOFF %": "pct_runoff",
-                "GENERAL VOTES ": "votes_general",
-                "GENERAL %": "pct_general",
-                "GE WINNER INDICATOR": "won_general",
-                "PARTY": "party",
-                "DISTRICT": "district",
-                "D": "district",
-            },
-            inplace=True,
-            errors="ignore",
+ELECTION_FILES = [
+    "https://www.fec.gov/documents/1700/federalelections2014.xls",
+    "https://www.fec.gov/documents/1890/federalelections2016.xlsx",
+    "https://www.fec.gov/documents/2706/federalelections2018.xlsx",
+]
+# The downloaded workbooks, and the cleaned up House results out of them
+PRIMARY_CACHE = os.path.join(DATA_ROOT, "fec")
+# Bump this whenever clean_primary_year changes, to rebuild the cached results.
+CACHE_VERSION = 1
+# Never go to the FEC website; everything has to be in PRIMARY_CACHE already.
+OFFLINE = os.environ.get("DDRL_OFFLINE", "") not in ["", "0"]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fetch_workbook(url, offline=OFFLINE):
+    """
+    The local copy of the workbook at url, downloading it the first time.
+    """
+    path = os.path.join(PRIMARY_CACHE, url.split("/")[-1])
+    if os.path.exists(path):
+        return path
+    if offline:
+        raise FileNotFoundError(
+            "{0} isn't cached in {1}, and we're offline".format(url, PRIMARY_CACHE)
         )
+    print("Downloading {0}...".format(url))
+    os.makedirs(PRIMARY_CACHE, exist_ok=True)
+    response = requests.get(url, timeout=120)
+    response.raise_for_status()
+    with open(path + ".tmp", "wb") as f:
+        f.write(response.content)
+    os.replace(path + ".tmp", path)
+    return path
+
 
-        df_year = df_year.dropna(subset=["Cand.ID"])
-        df_year["Cand.ID"] = df_year["Cand.ID"].str.strip()
-        df_year["party"] = df_year["party"].str.strip()
-        # Minnesota's Dem party is officially the Democratic-Farmer-Labor party...
-        df_year.loc[df_year["party"] == "DFL", "party"] = "D"
-        df_year = df_year[(df_year["party"] == "D") | (df_year["party"] == "R")]
-
-        # A couple of manual fixes:
-        if year == "2016":
-            # Dave Koller has an extra random row
-            df_year.drop(752, inplace=True)
-
-        if year == "2018":
-            # John Chrin is two rows for some reason
-            df_year.loc[3480, "votes_primary"] = df_year.loc[3481]["votes_primary"]
-            df_year.loc[3480, "pct_primary"] = df_year.loc[3481]["pct_primary"]
-            df_year.drop(3481, inplace=True)
-
-            # Jennifer Zordani has the wrong ID
-            df_year.loc[1141, "Cand.ID"] = "H8IL06105"
-
-            # Anya Tynia is listed multiple times for different parties, only gets >30 votes once
-            df_year.drop([4293], inplace=True)
-
-        df_year = df_year[
-            [
-                "Cand.ID",
-                # "party",
-                "votes_primary",
-                "pct_primary",
-                "votes_runoff",
-                "pct_runoff",
-                "votes_general",
-                "pct_general",
-                "won_general",
-                # "district",
-            ]
+def load_primary_year(url, offline=OFFLINE):
+    """
+    The cleaned up House results for one year's workbook. They're cached as a
+    pickle named after the workbook's hash, so the workbook (which takes a while
+    to parse) is only read again when it's been replaced.
+    """
+    year = url.split(".")[-2][-4:]
+    workbook = fetch_workbook(url, offline)
+    cache = os.path.join(
+        PRIMARY_CACHE,
+        "primaries_{0}_v{1}_{2}.pkl".format(
+            year, CACHE_VERSION, file_hash(workbook)[:16]
+        ),
+    )
+    if os.path.exists(cache):
+        return pd.read_pickle(cache)
+
+    df_year = pd.read_excel(
+        workbook,
+        sheet_name="{year} US House Results by State".format(year=year),
+        index_col=0,
+    )
+    df_year = clean_primary_year(df_year, year)
+    # Throw away whatever was cached for older workbooks or rules
+    for stale in glob(os.path.join(PRIMARY_CACHE, "primaries_{0}_*.pkl".format(year))):
+        os.remove(stale)
+    df_year.to_pickle(cache + ".tmp", compression=None)
+    os.replace(cache + ".tmp", cache)
+    return df_year
+
+
+def clean_primary_year(df_year, year):
+    """
+    Pick out and clean up the D and R candidates' results from one year's sheet.
+    """
+    df_year.rename(
+        columns={
+            "FEC ID#": "Cand.ID",
+            "PRIMARY VOTES": "votes_primary",
+            "PRIMARY %": "pct_primary",
+            "RUNOFF VOTES": "votes_runoff",
+            "RUNOFF %": "pct_runoff",
+            "GENERAL VOTES ": "votes_general",
+            "GENERAL %": "pct_general",
+            "GE WINNER INDICATOR": "won_general",
+            "PARTY": "party",
+            "DISTRICT": "district",
+            "D": "district",
+        },
+        inplace=True,
+        errors="ignore",
+    )
+
+    df_year = df_year.dropna(subset=["Cand.ID"])
+    df_year["Cand.ID"] = df_year["Cand.ID"].str.strip()
+    df_year["party"] = df_year["party"].str.strip()
+    # Minnesota's Dem party is officially the Democratic-Farmer-Labor party...
+    df_year.loc[df_year["party"] == "DFL", "party"] = "D"
+    df_year = df_year[(df_year["party"] == "D") | (df_year["party"] == "R")]
+
+    # A couple of manual fixes:
+    if year == "2016":
+        # Dave Koller has an extra random row
+        df_year.drop(752, inplace=True)
+
+    if year == "2018":
+        # John Chrin is two rows for some reason
+        df_year.loc[3480, "votes_primary"] = df_year.loc[3481]["votes_primary"]
+        df_year.loc[3480, "pct_primary"] = df_year.loc[3481]["pct_primary"]
+        df_year.drop(3481, inplace=True)
+
+        # Jennifer Zordani has the wrong ID
+        df_year.loc[1141, "Cand.ID"] = "H8IL06105"
+
+        # Anya Tynia is listed multiple times for different parties, only gets >30 votes once
+        df_year.drop([4293], inplace=True)
+
+    df_year = df_year[
+        [
+            "Cand.ID",
+            # "party",
+            "votes_primary",
+            "pct_primary",
+            "votes_runoff",
+            "pct_runoff",
+            "votes_general",
+            "pct_general",
+            "won_general",
+            # "district",
         ]
-        df_year["cycle"] = int(year)
+    ]
+    df_year["cycle"] = int(year)
 
-        # Remove special election if there's already a regular election
-        df_year.drop_duplicates(subset=["Cand.ID", "cycle"], inplace=True)
+    # Remove special election if there's already a regular election
+    df_year.drop_duplicates(subset=["Cand.ID", "cycle"], inplace=True)
+    return df_year
 
-        if df_primaries is None:
-            df_primaries = df_year
-        else:
-            df_primaries = pd.concat([df_primaries, df_year])
 
-    return df_primaries
+def download_primary_data(offline=OFFLINE):
+    """
+    Download the primary election data from the FEC website and put into dataframe.
+    (Only the first time; after that it comes out of PRIMARY_CACHE.)
+    """
+    return pd.concat([load_primary_year(url, offline) for url in ELECTION_FILES])
 
 
-def merge_primary_data():
-    df_dime = pd.read_csv("../../data/dime_final.csv")
-    df_primary = download_primary_data()
+def merge_primary_data(offline=OFFLINE):
+    df_dime = read_frame(os.path.join(DATA_ROOT, "dime_final.csv"))
+    df_primary = download_primary_data(offline)
     df_merged = pd.merge(df_dime, df_primary, how="left", on=["Cand.ID", "cycle"])
     # 11/6/2020: 10510 pre-2020 DIME candidates, 4826 primary results of which 51 unmatched
-    df_merged.drop(columns=["Unnamed: 0", "Unnamed: 0.1"], inplace=True)
-    df_merged.to_csv("../../data/dime_with_primaries.csv", index=False)
+    write_frame(
+        df_merged, os.path.join(DATA_ROOT, "dime_with_primaries.csv"), index=False
+    )
 
 
 if __name__ == "__main__":
-    merge_primary_data()
+    # `python merge_primary_data.py --offline` to only use the cached workbooks
+    merge_primary_data(offline=OFFLINE or "--offline" in sys.argv[1:])
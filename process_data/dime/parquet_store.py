@@ -0,0 +1,91 @@
+# Columnar (Parquet) store for the DIME contributions, as an alternative to the
+# contribDB table in dime.sqlite3. Needs pyarrow, which the SQLite-only pipeline
+# doesn't.
+import os
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITION_COLS = ["cycle", "seat"]
+_arrow_types = {"integer": pa.int64(), "real": pa.float64()}
+
+
+class ParquetPartitionWriter:
+    """
+    Writes rows into a hive-partitioned Parquet dataset under root, with one file
+    named `name`.parquet per partition. Rerunning a load with the same name
+    replaces its files instead of adding duplicates next to them.
+    """
+
+    def __init__(self, root, name, headers, types, partition_cols=PARTITION_COLS):
+        self.root = root
+        self.name = name
+        self.headers = headers
+        self.partition_index = [headers.index(col) for col in partition_cols]
+        self.partition_cols = partition_cols
+        self.value_index = [
+            i for i in range(len(headers)) if i not in self.partition_index
+        ]
+        self.schema = pa.schema(
+            [
+                (headers[i], _arrow_types.get(types[i], pa.string()))
+                for i in self.value_index
+            ]
+        )
+        self.writers = {}
+
+    def _partition_path(self, key):
+        parts = [
+            "%s=%s"
+            % (
+                col,
+                (
+                    "__HIVE_DEFAULT_PARTITION__"
+                    if value is None
+                    else quote(str(value), safe="")
+                ),
+            )
+            for col, value in zip(self.partition_cols, key)
+        ]
+        return os.path.join(self.root, *parts)
+
+    def write(self, rows):
+        partitions = {}
+        for row in rows:
+            key = tuple(row[i] for i in self.partition_index)
+            partitions.setdefault(key, []).append(row)
+        for key, partition_rows in partitions.items():
+            writer = self.writers.get(key)
+            if writer is None:
+                path = self._partition_path(key)
+                os.makedirs(path, exist_ok=True)
+                writer = pq.ParquetWriter(
+                    os.path.join(path, self.name + ".parquet"), self.schema
+                )
+                self.writers[key] = writer
+            columns = list(zip(*partition_rows))
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(columns[i], type=field.type)
+                        for i, field in zip(self.value_index, self.schema)
+                    ],
+                    schema=self.schema,
+                )
+            )
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def read_contributions(root, columns, filter=None):
+    """
+    Read just the given columns of the contributions store into a DataFrame.
+    Filters on the partition columns only touch the matching partitions.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
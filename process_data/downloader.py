@@ -0,0 +1,152 @@
+# Concurrent file downloader used to fetch the disclosure PDFs.
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import requests
+from pandas import DataFrame
+from requests.adapters import HTTPAdapter
+
+PDF_MAGIC = b"%PDF"
+CHUNK_SIZE = 1 << 16
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """
+    A session whose connection pool is big enough for every worker to keep its
+    own connection open to the server.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def is_pdf(path: str) -> bool:
+    """
+    Whether the file at path exists and starts with the PDF magic bytes.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(PDF_MAGIC)) == PDF_MAGIC
+    except OSError:
+        return False
+
+
+def fetch_file(
+    session: requests.Session,
+    url: str,
+    dst: str,
+    retries: int = 3,
+    backoff: float = 1.0,
+    timeout: float = 60,
+) -> dict:
+    """
+    Download url to dst, retrying with exponential backoff on connection errors,
+    server errors and truncated transfers. The file is written to a temp file in
+    the same folder and only renamed into place once it's complete and actually
+    a PDF, so a failed download never leaves anything behind at dst.
+
+    Returns a dict describing what happened, for the download manifest.
+    """
+    result = {
+        "url": url,
+        "dst": dst,
+        "status": None,
+        "bytes": 0,
+        "attempts": 0,
+        "error": None,
+    }
+    # NB: the temp name must not contain ".pdf", or the parser would pick it up.
+    fd, tmp = tempfile.mkstemp(
+        prefix=".download-", suffix=".part", dir=os.path.dirname(dst)
+    )
+    os.close(fd)
+    try:
+        for attempt in range(1, retries + 1):
+            result["attempts"] = attempt
+            retry = False
+            try:
+                with session.get(url, stream=True, timeout=timeout) as r:
+                    result["status"] = r.status_code
+                    if r.status_code != 200:
+                        result["error"] = "HTTP {0}".format(r.status_code)
+                        # Only worth trying again if the server is struggling.
+                        retry = r.status_code == 429 or r.status_code >= 500
+                    else:
+                        size = 0
+                        with open(tmp, "wb") as f:
+                            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                                f.write(chunk)
+                                size += len(chunk)
+                        # Content-Length counts the bytes as sent, which with a
+                        # Content-Encoding like gzip isn't what iter_content gave.
+                        received = r.raw.tell()
+                        expected = r.headers.get("Content-Length")
+                        if expected is not None and int(expected) != received:
+                            result["error"] = "truncated: got {0} of {1} bytes".format(
+                                received, expected
+                            )
+                            retry = True
+                        elif not is_pdf(tmp):
+                            result["error"] = "not a pdf"
+                        else:
+                            os.replace(tmp, dst)
+                            result["bytes"] = size
+                            result["error"] = None
+                            return result
+            except requests.RequestException as e:
+                result["error"] = str(e)
+                retry = True
+
+            if not retry or attempt == retries:
+                break
+            time.sleep(backoff * 2 ** (attempt - 1))
+        return result
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def download_files(
+    jobs: List[Tuple[str, str]],
+    workers: int = 8,
+    retries: int = 3,
+    backoff: float = 1.0,
+) -> DataFrame:
+    """
+    Download each (url, dst) pair in jobs using a pool of worker threads that
+    share one connection pool. Prints the throughput once everything's done and
+    returns one row per job describing the outcome.
+    """
+    session = make_session(workers)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(
+            pool.map(
+                lambda job: fetch_file(session, job[0], job[1], retries, backoff),
+                jobs,
+            )
+        )
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    df_results = DataFrame(
+        results, columns=["url", "dst", "status", "bytes", "attempts", "error"]
+    )
+    fetched = df_results[df_results["error"].isna()]
+    megabytes = fetched["bytes"].sum() / 1e6
+    print(
+        "Fetched {0} of {1} files ({2:.1f} MB) in {3:.1f}s: {4:.1f} files/s, {5:.2f} MB/s".format(
+            len(fetched),
+            len(jobs),
+            megabytes,
+            elapsed,
+            len(fetched) / elapsed if elapsed > 0 else 0,
+            megabytes / elapsed if elapsed > 0 else 0,
+        )
+    )
+    return df_results
@@ -0,0 +1,91 @@
+# Reading and writing the data files the pipeline stages hand to each other
+# (pfd_final, dime_uncleaned, dime_final, dime_with_primaries, crosswalk and
+# merged_data). Each one is still written as a CSV, for the analysis notebooks
+# and for looking at, with a Parquet copy next to it that keeps the dtypes and
+# can be read a few columns at a time. Without pyarrow, it's just the CSVs.
+import os
+import re
+from typing import List, Optional
+
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    import pyarrow as pa
+
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+# What read_csv calls unnamed (index) columns; they're never real data.
+JUNK_COLUMN = re.compile(r"^Unnamed: \d+(\.\d+)*$")
+
+
+def parquet_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def dedupe_columns(columns) -> List[str]:
+    """
+    Column names as strings, with repeats renamed the way read_csv would: the
+    second "cycle" becomes "cycle.1", the third "cycle.2" and so on.
+    """
+    seen = {}
+    deduped = []
+    for column in map(str, columns):
+        name = column
+        while name in seen:
+            seen[column] += 1
+            name = "{0}.{1}".format(column, seen[column])
+        seen[name] = 0
+        deduped.append(name)
+    return deduped
+
+
+def write_frame(df: DataFrame, csv_path: str, index: bool = True):
+    """
+    df.to_csv(csv_path, index=index), plus the Parquet copy. The Parquet copy
+    has the columns read_csv would find in the CSV, without the unnamed ones: a
+    named index (like pfd_final's file) becomes a column, an unnamed one is
+    dropped.
+    """
+    df.to_csv(csv_path, index=index)
+    if not HAVE_PARQUET:
+        return
+    named_index = any(name is not None for name in df.index.names)
+    table = df.reset_index(drop=not (index and named_index))
+    table.columns = dedupe_columns(table.columns)
+    table = table[[c for c in table.columns if not JUNK_COLUMN.match(c)]]
+
+    path = parquet_path(csv_path)
+    try:
+        table.to_parquet(path + ".tmp", index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # e.g. an object column mixing numbers and strings
+        print("Couldn't write {0}, the CSV will be used instead: {1}".format(path, e))
+        for stale in [path, path + ".tmp"]:
+            if os.path.exists(stale):
+                os.remove(stale)
+        return
+    os.replace(path + ".tmp", path)
+
+
+def read_frame(csv_path: str, columns: Optional[List[str]] = None) -> DataFrame:
+    """
+    A hand-off written by write_frame, with only the given columns (or all of
+    them). It comes from the Parquet copy (memory-mapped) unless that's missing
+    or older than the CSV, e.g. because the CSV was edited by hand. Either way,
+    the unnamed columns are left out.
+    """
+    path = parquet_path(csv_path)
+    if (
+        HAVE_PARQUET
+        and os.path.exists(path)
+        and (
+            not os.path.exists(csv_path)
+            or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+        )
+    ):
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    df = pd.read_csv(csv_path, usecols=columns)
+    return df[[c for c in df.columns if not JUNK_COLUMN.match(c)]]
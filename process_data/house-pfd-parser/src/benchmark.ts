@@ -0,0 +1,61 @@
+// Times fixRowsThatCrossPages on a synthetic Schedule A, 10k rows across 200
+// pages by default: `npm run benchmark -- [ROWS] [PAGES]`.
+import { fixRowsThatCrossPages } from './fixRowsThatCrossPages';
+import { Row, Table } from './parsePage';
+
+/* Every fifth page ends with a row that's cut off, whose rest starts the next
+   page, and every other page starts with one to three rows continuing the
+   last asset's name. Returns the table and how many rows should be merged. */
+const syntheticTable = (rows: number, pages: number): [Table, number] => {
+  const table: Table = {
+    part: 'schedule a',
+    name: 'assets and "unearned" income',
+    cols: [{ name: 'page', slug: 'page' }],
+    rows: [],
+  };
+  const rowsPerPage = Math.ceil(rows / pages);
+  let merged = 0;
+
+  for (let page = 1; page <= pages && table.rows.length < rows; page++) {
+    const pageRows: Row[] = [];
+    if (page > 1 && (page - 1) % 5 === 0) {
+      pageRows.push({ page, asset: '(rest)', owner: 'SP' });
+    } else if (page > 1 && page % 2 === 0) {
+      for (let i = 0; i <= page % 3; i++) {
+        pageRows.push({ page, asset: '[ST]' });
+      }
+    }
+    merged += pageRows.length;
+    while (pageRows.length < rowsPerPage) {
+      const cutOff =
+        page % 5 === 0 && page < pages && pageRows.length === rowsPerPage - 1;
+      pageRows.push({
+        page,
+        asset: `Asset ${table.rows.length + pageRows.length}`,
+        'value-of-asset': cutOff ? '$1,001 -' : '$1,001 - $15,000',
+        'income-type(s)': 'Dividends',
+      });
+    }
+    table.rows = table.rows.concat(pageRows);
+  }
+  return [table, merged];
+};
+
+const rows = process.argv[2] !== undefined ? Number(process.argv[2]) : 10000;
+const pages = process.argv[3] !== undefined ? Number(process.argv[3]) : 200;
+const [table, merged] = syntheticTable(rows, pages);
+const rowCount = table.rows.length;
+
+const start = process.hrtime();
+const fixed = fixRowsThatCrossPages(table, '10000001');
+const [seconds, nanoseconds] = process.hrtime(start);
+
+if (fixed.rows.length !== rowCount - merged) {
+  throw new Error(
+    `Expected ${rowCount - merged} rows after merging, got ${fixed.rows.length}`,
+  );
+}
+console.log(
+  `fixRowsThatCrossPages: ${rowCount} rows across ${pages} pages, ` +
+    `${merged} merged, ${(seconds * 1e3 + nanoseconds / 1e6).toFixed(1)}ms`,
+);
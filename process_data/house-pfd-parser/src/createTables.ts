@@ -1,7 +1,7 @@
 import path from 'path';
 import { csvFormat } from 'd3-dsv';
-import fs from 'fs';
 import { Table } from './parsePage';
+import { TableSink } from './tableSink';
 
 import { reformatHeaders } from './reformatHeaders';
 import { fixRowsThatCrossPages } from './fixRowsThatCrossPages';
@@ -9,20 +9,17 @@ import { fixRowsThatCrossPages } from './fixRowsThatCrossPages';
 export const createTables = (
   tables: Table[],
   pdfPath: string,
-  outPath: string,
+  sink: TableSink,
   skipHeaders: Record<string, boolean>,
 ): Promise<unknown> => {
   const fileName = path.basename(pdfPath, '.pdf').replace('.PDF', '');
   console.log('TCL: createTables -> fileName', fileName);
   return new Promise((resolve) => {
     tables.forEach((table) => {
-      const csvFile = `${
-        outPath +
-        table.name
-          .toLowerCase()
-          .replace(/[ ,']+/g, '-')
-          .replace(/"/g, '')
-      }.csv`;
+      const csvFile = `${table.name
+        .toLowerCase()
+        .replace(/[ ,']+/g, '-')
+        .replace(/"/g, '')}.csv`;
 
       table = fixRowsThatCrossPages(table, fileName);
 
@@ -35,10 +32,10 @@ export const createTables = (
         } else {
           skipHeaders[table.name] = true;
         }
-        fs.appendFileSync(csvFile, `${csvString}\n`);
+        sink.append(csvFile, `${csvString}\n`);
       } else {
         const csvString = `${fileName} - None disclosed`;
-        fs.appendFileSync(csvFile, `${csvString}\n`);
+        sink.append(csvFile, `${csvString}\n`);
       }
     });
 
@@ -1,54 +1,60 @@
-import { Table } from './parsePage';
+import { Row, Table } from './parsePage';
+
+// Values that end in "-" got cut off
+const isCutOff = (row: Row, keys: string[]): boolean =>
+  keys.some((key) => {
+    const value = row[key];
+    return typeof value === 'string' && value[value.length - 1] === '-';
+  });
 
 export const fixRowsThatCrossPages = (
   table: Table,
   fileName: string,
 ): Table => {
-  const rowsToDelete: number[] = [];
+  const rowsToDelete = new Set<number>();
+  // The last row that's being kept, which the rows continuing it go into
+  let keptRow: Row | undefined;
+  let keptPage: number | undefined;
+  // The row before, as it was before anything was appended to it
+  let previousKeys: string[] = [];
+  let previousPage: number | undefined;
+  let previousCutOff = false;
 
   table.rows.forEach((row, index) => {
     const keys = Object.keys(row);
-    if (keys.indexOf('page') !== -1) {
-      keys.forEach((key) => {
-        const valueLength = row[key].length;
-        const lastCharacter = row[key][valueLength - 1];
-        // Find values that end in "-", which means they got cut off
-        if (lastCharacter !== undefined && lastCharacter === '-') {
-          // Append all values of next row
-          if (row['page'] !== table.rows[index + 1]['page']) {
-            keys.forEach((k) => {
-              const nextRowValue = table.rows[index + 1][k];
-              row[k] += nextRowValue !== undefined ? ` ${nextRowValue}` : '';
-            });
-            //  Mark next row for deletion
-            rowsToDelete.push(index + 1);
-          }
-        }
-      });
-      // Find rows with two or less values, including "page"
-      if (keys.length <= 2 && rowsToDelete.indexOf(index) === -1) {
-        const previousRow = table.rows[index - 1];
-        if (row['page'] !== previousRow['page']) {
-          keys.forEach((k) => {
-            previousRow[k] += row[k] !== undefined ? ` ${row[k]}` : '';
-          });
-          //  Mark next row for deletion
-          if (rowsToDelete.indexOf(index) < 0) {
-            rowsToDelete.push(index);
-          }
-        }
+    const page = row['page'];
+    const hasPage = keys.indexOf('page') !== -1;
+    const cutOff = hasPage && isCutOff(row, keys);
+    const target = keptRow;
+
+    if (hasPage && target !== undefined) {
+      if (previousCutOff && page !== previousPage) {
+        // Append all values of the row after one that got cut off
+        previousKeys.forEach((k) => {
+          target[k] += row[k] !== undefined ? ` ${row[k]}` : '';
+        });
+        rowsToDelete.add(index);
+      } else if (keys.length <= 2 && page !== keptPage) {
+        // Rows with two or less values, including "page", at the top of a
+        // page (however many there are) continue the last row kept
+        keys.forEach((k) => {
+          target[k] += ` ${row[k]}`;
+        });
+        rowsToDelete.add(index);
       }
     }
 
+    if (!rowsToDelete.has(index)) {
+      keptRow = row;
+      keptPage = page;
+    }
+    previousKeys = keys;
+    previousPage = page;
+    previousCutOff = cutOff;
     row.file = fileName;
   });
 
   /* Now remove all of the rows that we decided to delete. */
-  const filteredRows = table.rows.filter((row, index) => {
-    const uniqueRowsToDelete = Array.from(new Set(rowsToDelete));
-    return uniqueRowsToDelete.indexOf(index) === -1;
-  });
-
-  table.rows = filteredRows;
+  table.rows = table.rows.filter((row, index) => !rowsToDelete.has(index));
   return table;
 };
@@ -8,25 +8,28 @@ import fs from 'fs';
 import pdfjsLib from 'pdfjs-dist';
 import { createTables } from './createTables';
 import { parsePage, Table } from './parsePage';
+import { TableSink } from './tableSink';
 
 const skipHeaders = {};
 
-async function processFiling(pdfPath: string, outPath: string) {
+async function processFiling(pdfPath: string, sink: TableSink) {
   const data = new Uint8Array(fs.readFileSync(pdfPath));
   let tables: Table[] = [];
   const doc = await pdfjsLib.getDocument(data).promise;
 
   const numPages = doc.numPages;
-  const ignoreRest = false; // Used to ignore the rest of the document
-  /* TODO: should ignoreRest be modified each time? */
-  for (let i = 1; i <= numPages; i++) {
-    tables = await parsePage(i, doc, ignoreRest, tables, outPath, pdfPath);
+  let ignoreRest = false; // Used to ignore the rest of the document
+  /* Pages after the one that sets ignoreRest aren't fetched at all. */
+  for (let i = 1; i <= numPages && !ignoreRest; i++) {
+    ({ tables, ignoreRest } = await parsePage(i, doc, tables, sink, pdfPath));
   }
 
-  return createTables(tables, pdfPath, outPath, skipHeaders);
+  return createTables(tables, pdfPath, sink, skipHeaders);
 }
 
-const run = async (filePath: string, outPath: string) => {
+/* With a part, the output files are written as parts (see TableSink), so
+   that several parsers can run on their own shards into the same outPath. */
+const run = async (filePath: string, outPath: string, part?: string) => {
   /* Create folders that don't exist. */
   for (const path of [filePath, outPath]) {
     if (!fs.existsSync(path)) {
@@ -36,15 +39,19 @@ const run = async (filePath: string, outPath: string) => {
     }
   }
 
-  const noContentCSV = `${outPath}no-content.csv`;
-  fs.appendFileSync(noContentCSV, `File\n`);
+  const sink = new TableSink(outPath, part);
+  sink.append('no-content.csv', `File\n`);
 
   const files = fs
     .readdirSync(filePath)
     .filter((file) => file.toLowerCase().includes('.pdf'));
 
-  for (let pos = 0; pos < files.length; pos++) {
-    await processFiling(filePath + files[pos], outPath);
+  try {
+    for (let pos = 0; pos < files.length; pos++) {
+      await processFiling(filePath + files[pos], sink);
+    }
+  } finally {
+    sink.close();
   }
   console.log('done');
 };
@@ -55,7 +62,16 @@ const run = async (filePath: string, outPath: string) => {
     process.argv[2] ||
       `../data/raw_disclosures/` /* `${__dirname}/data/input/` */,
     process.argv[3] || `../data/parsed_disclosures/`,
-  ).then(() => {
-    console.log('done');
-  }, console.error);
+    process.argv[4],
+  ).then(
+    () => {
+      console.log('done');
+    },
+    (error) => {
+      /* Exit with an error, so a run that died partway isn't taken for a
+         finished one (parse_cache.py would cache the rest as empty). */
+      console.error(error);
+      process.exit(1);
+    },
+  );
 })();
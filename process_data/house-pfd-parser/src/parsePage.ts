@@ -1,7 +1,7 @@
 import pdfjsLib from 'pdfjs-dist';
-import fs from 'fs';
 import _ from 'lodash';
 import { v4 as uuidv4 } from 'uuid';
+import { TableSink } from './tableSink';
 
 export interface Table {
   part: string;
@@ -15,22 +15,26 @@ export interface Row {
   [index: string]: any;
 }
 
+/* ignoreRest is set once the page reaches the exclusions section, or a
+   schedule after schedule I, after which nothing else in the document is
+   used. */
+export interface ParsedPage {
+  tables: Table[];
+  ignoreRest: boolean;
+}
+
 export const parsePage = async (
   pageNum: number,
   doc: pdfjsLib.PDFDocumentProxy,
-  ignoreRest: boolean,
   tables: Table[],
-  outPath: string,
+  sink: TableSink,
   pdfPath: string,
-): Promise<Table[]> => {
+): Promise<ParsedPage> => {
   const page = await doc.getPage(pageNum);
   const content = await page.getTextContent();
+  let ignoreRest = false;
   if (content.items.length === 0) {
-    if (!ignoreRest) {
-      const noContentCSV = `${outPath}no-content.csv`;
-      fs.appendFileSync(noContentCSV, `${pdfPath}\n`);
-      ignoreRest = true;
-    }
+    sink.append('no-content.csv', `${pdfPath}\n`);
   } else {
     const itemsGroupedByYPos = _.groupBy(
       content.items,
@@ -161,5 +165,5 @@ export const parsePage = async (
       }
     }
   }
-  return tables;
+  return { tables, ignoreRest };
 };
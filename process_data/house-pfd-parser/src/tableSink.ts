@@ -0,0 +1,67 @@
+import fs from 'fs';
+
+// How much to buffer for a file before writing it out
+const BLOCK_SIZE = 1 << 20;
+
+interface OutputFile {
+  fd: number;
+  chunks: string[];
+  length: number;
+}
+
+/* Where the parser's output goes. Each output file is opened once for the
+   whole run, and what's appended to it is written out in large blocks. With
+   a part, a file like liabilities.csv is written as liabilities.part-3.csv
+   instead, so that parsers running side by side can share an outPath. */
+export class TableSink {
+  private files: Record<string, OutputFile> = {};
+
+  constructor(private outPath: string, private part?: string) {}
+
+  append(fileName: string, text: string): void {
+    let file = this.files[fileName];
+    if (file === undefined) {
+      file = {
+        fd: fs.openSync(this.pathOf(fileName), 'a'),
+        chunks: [],
+        length: 0,
+      };
+      this.files[fileName] = file;
+    }
+    file.chunks.push(text);
+    file.length += text.length;
+    if (file.length >= BLOCK_SIZE) {
+      this.flushFile(file);
+    }
+  }
+
+  flush(): void {
+    Object.keys(this.files).forEach((fileName) => {
+      this.flushFile(this.files[fileName]);
+    });
+  }
+
+  close(): void {
+    this.flush();
+    Object.keys(this.files).forEach((fileName) => {
+      fs.closeSync(this.files[fileName].fd);
+    });
+    this.files = {};
+  }
+
+  private pathOf(fileName: string): string {
+    if (this.part === undefined) {
+      return this.outPath + fileName;
+    }
+    const base = fileName.replace(/\.csv$/, '');
+    return `${this.outPath}${base}.part-${this.part}.csv`;
+  }
+
+  private flushFile(file: OutputFile): void {
+    if (file.chunks.length > 0) {
+      fs.writeSync(file.fd, file.chunks.join(''));
+      file.chunks = [];
+      file.length = 0;
+    }
+  }
+}
@@ -0,0 +1,208 @@
+# Where the time goes: the pipeline's stage functions are wrapped in @stage,
+# which records each call's wall time, CPU time, peak RSS and the rows going in
+# and out. Set DDRL_REPORTS to a folder (pipeline.py sets it to the data root's
+# reports/) to keep a JSON report of the run there (one per process, rewritten
+# after every stage) and print each stage's times as it finishes; otherwise
+# nothing is written. Set DDRL_PROFILE to "cprofile" (or "pyinstrument", if it's
+# installed; it's cProfile otherwise) to profile the stages too; the profiles go
+# next to the report, in the data root's reports/ unless DDRL_REPORTS says
+# otherwise.
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from pandas import DataFrame
+
+try:
+    import resource
+except ImportError:
+    # Not on Windows, where peak RSS isn't recorded
+    resource = None
+
+try:
+    from pyinstrument import Profiler
+
+    HAVE_PYINSTRUMENT = True
+except ImportError:
+    HAVE_PYINSTRUMENT = False
+
+PROCESS_DATA = os.path.dirname(os.path.abspath(__file__))
+# "", "cprofile" or "pyinstrument"
+PROFILE = os.environ.get("DDRL_PROFILE", "")
+# Where the reports go, or "" for no reports. The data root is the one
+# pipeline.py sees, since the dime/ scripts run from there.
+DEFAULT_REPORT_PATH = os.path.join(
+    os.environ.get("DDRL_DATA_ROOT", os.path.join(PROCESS_DATA, "..", "data")),
+    "reports",
+)
+REPORT_PATH = os.environ.get("DDRL_REPORTS", DEFAULT_REPORT_PATH if PROFILE else "")
+
+STARTED = datetime.now()
+# The stages run so far, in the order they finished, and the ones running now
+# (innermost last)
+records: List[dict] = []
+running: List[dict] = []
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """
+    The most memory (resident set size) this process, or its largest finished
+    child, has used so far.
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def children_cpu() -> float:
+    """
+    The CPU time of the finished child processes (the node parser, the
+    process pools' workers); process_time() only counts this one.
+    """
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def report_file() -> str:
+    if not os.path.exists(REPORT_PATH):
+        os.makedirs(REPORT_PATH)
+    return os.path.join(
+        REPORT_PATH,
+        "run-{0}-{1}.json".format(STARTED.strftime("%Y%m%d-%H%M%S"), os.getpid()),
+    )
+
+
+def write_report():
+    path = report_file()
+    report = {
+        "started": STARTED.isoformat(timespec="seconds"),
+        "argv": sys.argv,
+        "pid": os.getpid(),
+        "stages": records,
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def record_rows(rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+    """
+    Set the rows in or out of the innermost stage running, for stages that
+    read or write their data themselves instead of taking or returning it.
+    """
+    if len(running) == 0:
+        return
+    if rows_in is not None:
+        running[-1]["rows_in"] = int(rows_in)
+    if rows_out is not None:
+        running[-1]["rows_out"] = int(rows_out)
+
+
+def start_profiler():
+    """
+    A started profiler, as DDRL_PROFILE asks for, or None.
+    """
+    if PROFILE == "":
+        return None
+    if PROFILE == "pyinstrument" and HAVE_PYINSTRUMENT:
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def save_profile(profiler, name: str) -> str:
+    """
+    Stop the profiler and write out its profile, returning where it went.
+    """
+    # Numbered like the stages in the report, as a stage can run more than once
+    base = "{0}-{1}-{2}".format(
+        os.path.splitext(report_file())[0], len(records) + 1, name
+    )
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        # Open with `python -m pstats` or snakeviz
+        path = base + ".prof"
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = base + ".html"
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    return path
+
+
+@contextmanager
+def measure(name: str):
+    """
+    Time the block as the stage name, yielding its record. Only the outermost
+    stage is profiled, as profilers can't be nested.
+    """
+    record = {"stage": name, "rows_in": None, "rows_out": None}
+    profiler = start_profiler() if len(running) == 0 else None
+    running.append(record)
+    wall, cpu, child_cpu = time.perf_counter(), time.process_time(), children_cpu()
+    ok = False
+    try:
+        yield record
+        ok = True
+    finally:
+        running.pop()
+        record["ok"] = ok
+        record["wall_s"] = round(time.perf_counter() - wall, 3)
+        record["cpu_s"] = round(time.process_time() - cpu, 3)
+        record["children_cpu_s"] = round(children_cpu() - child_cpu, 3)
+        record["peak_rss_mb"] = peak_rss_mb()
+        record["children_peak_rss_mb"] = peak_rss_mb(children=True)
+        if profiler is not None:
+            record["profile"] = save_profile(profiler, name)
+        records.append(record)
+        if REPORT_PATH != "":
+            write_report()
+            print(
+                "[{0}] {1:.1f}s, {2:.1f}s CPU ({3:.1f}s in child processes), "
+                "peak RSS {4}MB".format(
+                    name,
+                    record["wall_s"],
+                    record["cpu_s"],
+                    record["children_cpu_s"],
+                    record["peak_rss_mb"],
+                )
+            )
+
+
+def count_rows(values) -> Optional[int]:
+    counts = [len(value) for value in values if isinstance(value, DataFrame)]
+    return sum(counts) if len(counts) > 0 else None
+
+
+def stage(function):
+    """
+    Decorator that measures every call to function as a stage. The rows in are
+    those of the DataFrames it's passed, and the rows out those of the DataFrame
+    it returns, unless it calls record_rows.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with measure(function.__name__) as record:
+            record["rows_in"] = count_rows(list(args) + list(kwargs.values()))
+            result = function(*args, **kwargs)
+            if record["rows_out"] is None:
+                record["rows_out"] = count_rows([result])
+            return result
+
+    return wrapper
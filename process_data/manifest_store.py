@@ -0,0 +1,97 @@
+# Typed, preprocessed copies of the House Clerk's yearly {year}FD.txt manifests,
+# so that they only have to be parsed (and their names normalized) once.
+import hashlib
+import json
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from normalize import normalize_names
+from paths import data_path
+
+MANIFEST_PATH = data_path("pfd/manifests/")
+STORE_FOLDER = "store"
+# Bump this whenever what gets stored changes, to throw away the old copies.
+STORE_VERSION = 1
+
+NAME_FIELDS = ["Prefix", "Last", "First", "Suffix"]
+NORMALIZED_FIELDS = [field + "Normalized" for field in NAME_FIELDS]
+CATEGORICAL_FIELDS = ["FilingType", "StateDst"]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def categorize(df: DataFrame) -> DataFrame:
+    """
+    Make the low-cardinality fields categorical again; concatenating manifests
+    whose categories differ turns them back into plain objects.
+    """
+    return df.astype({field: "category" for field in CATEGORICAL_FIELDS})
+
+
+def parse_manifest(source: str) -> DataFrame:
+    """
+    Read a manifest file into a compactly typed dataframe, with the normalized
+    (upper case, ASCII, no dashes or spaces) name fields already computed.
+    """
+    df = pd.read_csv(source, delimiter="\t")
+    df = categorize(df.astype({"DocID": np.int32}))
+    names = normalize_names(df[NAME_FIELDS].astype(str), NAME_FIELDS, ascii=True)
+    for field, normalized in zip(NAME_FIELDS, NORMALIZED_FIELDS):
+        df[normalized] = names[field]
+    return df
+
+
+def load_manifest(year, manifest_path: str = MANIFEST_PATH) -> DataFrame:
+    """
+    The manifest for one year, from the store if it's there and the source file
+    hasn't changed since (same size and mtime, or failing that the same
+    content hash), and parsed and stored for next time otherwise.
+    """
+    source = os.path.join(manifest_path, "{0}FD.txt".format(year))
+    store_path = os.path.join(manifest_path, STORE_FOLDER)
+    store = os.path.join(store_path, "{0}FD.pkl".format(year))
+    meta_file = os.path.join(store_path, "{0}FD.json".format(year))
+
+    stat = os.stat(source)
+    meta = {"version": STORE_VERSION, "size": stat.st_size, "mtime": stat.st_mtime}
+    if os.path.exists(store) and os.path.exists(meta_file):
+        with open(meta_file) as f:
+            stored_meta = json.load(f)
+        if all(stored_meta.get(key) == value for key, value in meta.items()):
+            return pd.read_pickle(store)
+        meta["hash"] = file_hash(source)
+        if (
+            stored_meta.get("version") == STORE_VERSION
+            and stored_meta.get("hash") == meta["hash"]
+        ):
+            # Touched but not changed, so just remember the new mtime
+            with open(meta_file, "w") as f:
+                json.dump(meta, f)
+            return pd.read_pickle(store)
+
+    df = parse_manifest(source)
+    meta["hash"] = meta.get("hash") or file_hash(source)
+    if not os.path.exists(store_path):
+        os.makedirs(store_path)
+    df.to_pickle(store + ".tmp", compression=None)
+    os.replace(store + ".tmp", store)
+    with open(meta_file, "w") as f:
+        json.dump(meta, f)
+    return df
+
+
+def load_manifests(years: List[int], manifest_path: str = MANIFEST_PATH) -> DataFrame:
+    """
+    The manifests for all of the given years, concatenated in one go.
+    """
+    return categorize(pd.concat([load_manifest(year, manifest_path) for year in years]))
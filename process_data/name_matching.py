@@ -0,0 +1,108 @@
+# Fuzzy name matching for the crosswalk: string similarity scores, and a ranking
+# of the DIME candidates in a block against a name from the PFD manifest.
+from functools import lru_cache
+from typing import List, Tuple
+
+# A candidate is accepted if they score at least ACCEPT_SCORE and beat the
+# runner-up by at least MIN_MARGIN; if two or more candidates clear ACCEPT_SCORE
+# without that margin, the row is a real ambiguity and is left for review.
+# Candidates scoring below LIST_SCORE aren't worth listing at all.
+ACCEPT_SCORE = 0.9
+MIN_MARGIN = 0.05
+LIST_SCORE = 0.75
+
+
+@lru_cache(maxsize=None)
+def jaro_winkler(a: str, b: str, prefix_weight: float = 0.1) -> float:
+    """
+    Jaro-Winkler similarity of a and b, from 0 (nothing in common) to 1 (equal).
+    Memoized, since the same names get compared over and over again.
+    """
+    if a == b:
+        return 1.0
+    if len(a) == 0 or len(b) == 0:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    b_matched = [False] * len(b)
+    a_matches = []
+    for i, ch in enumerate(a):
+        for j in range(max(0, i - window), min(i + window + 1, len(b))):
+            if not b_matched[j] and b[j] == ch:
+                b_matched[j] = True
+                a_matches.append(ch)
+                break
+    matches = len(a_matches)
+    if matches == 0:
+        return 0.0
+    b_matches = [ch for ch, matched in zip(b, b_matched) if matched]
+    transpositions = sum(x != y for x, y in zip(a_matches, b_matches)) / 2
+    jaro = (
+        matches / len(a) + matches / len(b) + (matches - transpositions) / matches
+    ) / 3
+
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_weight * (1 - jaro)
+
+
+def similarity(a, b) -> float:
+    # Missing names (NaN) are never similar to anything
+    if not isinstance(a, str) or not isinstance(b, str):
+        return 0.0
+    return jaro_winkler(a, b)
+
+
+def token_set_similarity(tokens: List[str], cand_tokens: List[str]) -> float:
+    """
+    How well every name in tokens is matched by some name in cand_tokens,
+    regardless of which field it's in: catches first and last names swapped or
+    split up differently in the two data sets.
+    """
+    tokens = set(t for t in tokens if isinstance(t, str) and len(t) > 0)
+    cand_tokens = set(t for t in cand_tokens if isinstance(t, str) and len(t) > 0)
+    if len(tokens) == 0 or len(cand_tokens) == 0:
+        return 0.0
+    return sum(max(jaro_winkler(t, c) for c in cand_tokens) for t in tokens) / len(
+        tokens
+    )
+
+
+def score_candidate(last: str, first: str, cand) -> float:
+    """
+    Score a DIME candidate (with lname, llname, ffname and nname fields) against
+    a last and first name from the manifest.
+    """
+    last_score = max(similarity(last, cand.lname), similarity(last, cand.llname))
+    first_score = max(similarity(first, cand.ffname), similarity(first, cand.nname))
+    token_score = token_set_similarity(
+        [last, first], [cand.lname, cand.llname, cand.ffname, cand.nname]
+    )
+    return max(0.6 * last_score + 0.4 * first_score, token_score)
+
+
+def rank_candidates(last: str, first: str, block) -> List[Tuple[float, object]]:
+    """
+    The (score, candidate) pairs for the candidates in block scoring at least
+    LIST_SCORE, best first. Ties keep the order of the block, so the ranking is
+    deterministic.
+    """
+    scored = [(score_candidate(last, first, cand), cand) for cand in block]
+    scored = [(score, cand) for score, cand in scored if score >= LIST_SCORE]
+    # sorted() is stable, so equal scores stay in block order
+    return sorted(scored, key=lambda pair: -pair[0])
+
+
+def resolve(ranked: List[Tuple[float, object]]):
+    """
+    Apply the threshold policy to a ranking: the rid of the accepted candidate,
+    "dupe" if several candidates are too close to call, or None if nobody is a
+    good enough match.
+    """
+    if len(ranked) == 0 or ranked[0][0] < ACCEPT_SCORE:
+        return None
+    if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < MIN_MARGIN:
+        return "dupe"
+    return ranked[0][1].rid
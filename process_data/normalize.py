@@ -0,0 +1,59 @@
+# Vectorized normalization of the names and districts in the PFD and DIME
+# manifests, so that the two can be matched against each other.
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from unidecode import unidecode
+
+
+@lru_cache(maxsize=None)
+def transliterate(name: str) -> str:
+    """
+    unidecode, memoized: the same few thousand names come up over and over.
+    """
+    return unidecode(name)
+
+
+def normalize_name(name: str, ascii: bool = False) -> str:
+    """
+    Upper case, with dashes and spaces removed (and transliterated to ASCII, if
+    ascii is set).
+    """
+    name = name.upper()
+    if ascii:
+        name = transliterate(name)
+    return name.replace("-", "").replace(" ", "")
+
+
+def normalize_names(df: DataFrame, fields: List[str], ascii: bool = False) -> DataFrame:
+    """
+    Normalize the name fields of df with normalize_name, working out each
+    distinct name only once no matter how many rows or fields it appears in.
+    Anything that isn't a string becomes NaN.
+    """
+    names = pd.unique(np.concatenate([df[f].to_numpy(dtype=object) for f in fields]))
+    normalized = {
+        name: normalize_name(name, ascii) for name in names if isinstance(name, str)
+    }
+    return DataFrame({f: df[f].map(normalized) for f in fields}, index=df.index)
+
+
+def fix_at_large(districts: pd.Series) -> pd.Series:
+    """
+    At-large districts are 00 in PFD and 01 in DIME, so rewrite e.g. VT00 to VT01.
+    """
+    districts = districts.astype(object)
+    at_large = districts.str[-2:] == "00"
+    return districts.where(~at_large, districts.str[:-2] + "01")
+
+
+def last_names(names: pd.Series) -> pd.Series:
+    """
+    The last names out of "LAST,FIRST ..." style full names.
+    """
+    return names.map(
+        {name: name.split(",")[0] for name in names.unique() if isinstance(name, str)}
+    )
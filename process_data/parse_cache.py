@@ -0,0 +1,228 @@
+# Per-document cache of the house-pfd-parser output, keyed by DocID and the
+# content hash of the PDF, so that reruns only parse new or changed filings.
+import csv
+import hashlib
+import os
+import shutil
+from typing import Callable, Dict, List
+
+from parser_shards import OUTPUT_FILES, link_shard, merge_csv_parts
+
+TABLE_FILES = [name for name in OUTPUT_FILES if name != "no-content.csv"]
+INDEX_FIELDS = ["doc", "size", "mtime", "hash"]
+
+
+def doc_id(filename: str) -> str:
+    """
+    The DocID the parser writes into the "file" column for a given pdf name.
+    """
+    name = os.path.basename(filename)
+    if name.endswith(".pdf"):
+        name = name[: -len(".pdf")]
+    return name.replace(".PDF", "")
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_index(cache_path: str) -> Dict[str, dict]:
+    """
+    The index maps each DocID to the size, mtime and hash of its pdf when it was
+    last hashed, so unchanged files don't have to be read again.
+    """
+    index_file = os.path.join(cache_path, "index.csv")
+    if not os.path.exists(index_file):
+        return {}
+    with open(index_file, newline="") as f:
+        return {entry["doc"]: entry for entry in csv.DictReader(f)}
+
+
+def save_index(cache_path: str, index: Dict[str, dict]):
+    index_file = os.path.join(cache_path, "index.csv")
+    with open(index_file + ".tmp", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_FIELDS)
+        writer.writeheader()
+        for doc in sorted(index):
+            writer.writerow(index[doc])
+    os.replace(index_file + ".tmp", index_file)
+
+
+def hash_pdfs(file_path: str, index: Dict[str, dict]) -> Dict[str, dict]:
+    """
+    Build a fresh index for the pdfs in file_path, only rehashing those whose
+    size or mtime changed since the last run.
+    """
+    hashes = {}
+    for f in os.listdir(file_path):
+        if ".pdf" not in f.lower():
+            continue
+        path = os.path.join(file_path, f)
+        stat = os.stat(path)
+        doc = doc_id(f)
+        entry = {"doc": doc, "size": str(stat.st_size), "mtime": str(stat.st_mtime)}
+        previous = index.get(doc)
+        if (
+            previous is not None
+            and previous["size"] == entry["size"]
+            and previous["mtime"] == entry["mtime"]
+        ):
+            entry["hash"] = previous["hash"]
+        else:
+            entry["hash"] = file_hash(path)
+        entry["file"] = f
+        hashes[doc] = entry
+    return hashes
+
+
+def entry_path(cache_path: str, doc: str, digest: str) -> str:
+    return os.path.join(cache_path, doc, digest)
+
+
+def split_parser_output(out_path: str, cache_path: str, hashes: Dict[str, dict]):
+    """
+    Break up the output CSVs of a parser run into one cache entry per document.
+    Every entry gets its own copy of the header. Only the documents that show up
+    in the output (in a table or in no-content.csv) get an entry: if the parser
+    died partway through, the ones it never got to must not count as parsed.
+    Returns the DocIDs that got an entry.
+    """
+    created = set()
+
+    def new_entry(doc):
+        path = entry_path(cache_path, doc, hashes[doc]["hash"])
+        if doc not in created:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.makedirs(path)
+            created.add(doc)
+        return path
+
+    for name in TABLE_FILES:
+        parsed_file = os.path.join(out_path, name)
+        if not os.path.exists(parsed_file):
+            continue
+        header = None
+        rows_by_doc = {}
+        with open(parsed_file, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) == 0:
+                    continue
+                if row[:2] == ["file", "page"]:
+                    header = header or row
+                    continue
+                doc = row[0].split(" - None disclosed")[0]
+                rows_by_doc.setdefault(doc, []).append(row)
+        for doc, rows in rows_by_doc.items():
+            path = new_entry(doc)
+            with open(os.path.join(path, name), "w", newline="") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                if header is not None:
+                    writer.writerow(header)
+                writer.writerows(rows)
+
+    no_content_file = os.path.join(out_path, "no-content.csv")
+    if os.path.exists(no_content_file):
+        with open(no_content_file) as f:
+            for line in f:
+                if line.strip() in ["", "File"]:
+                    continue
+                pdf = os.path.basename(line.strip())
+                path = new_entry(doc_id(pdf))
+                with open(os.path.join(path, "no-content.csv"), "a") as out:
+                    out.write(pdf + "\n")
+    return created
+
+
+def rebuild_parser_output(
+    file_path: str, cache_path: str, out_path: str, hashes: Dict[str, dict]
+):
+    """
+    Write the combined parser output CSVs for the documents in hashes into
+    out_path from their cache entries, as if the parser had just run on them.
+    """
+    if os.path.exists(out_path):
+        shutil.rmtree(out_path)
+    os.makedirs(out_path)
+    entries = [
+        entry_path(cache_path, doc, hashes[doc]["hash"]) for doc in sorted(hashes)
+    ]
+    for name in TABLE_FILES:
+        merge_csv_parts(
+            [os.path.join(entry, name) for entry in entries],
+            os.path.join(out_path, name),
+            "file,page",
+        )
+    with open(os.path.join(out_path, "no-content.csv"), "w") as out:
+        out.write("File\n")
+        for entry in entries:
+            no_content_file = os.path.join(entry, "no-content.csv")
+            if os.path.exists(no_content_file):
+                with open(no_content_file) as f:
+                    for pdf in f:
+                        out.write(file_path + pdf)
+
+
+def parse_with_cache(
+    file_path: str,
+    cache_path: str,
+    out_path: str,
+    parse: Callable[[str, str], None],
+) -> List[str]:
+    """
+    Run parse(input_folder, output_folder) on only the pdfs in file_path that
+    aren't already cached under their current content hash, cache the results
+    per document, and then rebuild the full parser output in out_path from the
+    cache. Returns the DocIDs that had to be parsed.
+    """
+    if not os.path.exists(cache_path):
+        os.makedirs(cache_path)
+    hashes = hash_pdfs(file_path, load_index(cache_path))
+    stale = {
+        doc: entry
+        for doc, entry in hashes.items()
+        if not os.path.exists(entry_path(cache_path, doc, entry["hash"]))
+    }
+    print(
+        "{0} of {1} disclosure files are new or changed since the last parse".format(
+            len(stale), len(hashes)
+        )
+    )
+
+    if len(stale) > 0:
+        stage_path = os.path.join(cache_path, "staging")
+        if os.path.exists(stage_path):
+            shutil.rmtree(stage_path)
+        stage_in = os.path.join(stage_path, "input")
+        stage_out = os.path.join(stage_path, "output")
+        link_shard(file_path, [entry["file"] for entry in stale.values()], stage_in)
+        parse(stage_in + "/", stage_out + "/")
+        parsed = split_parser_output(stage_out, cache_path, stale)
+        shutil.rmtree(stage_path)
+        unparsed = sorted(set(stale) - parsed)
+        if len(unparsed) > 0:
+            print(
+                "No parser output for {0} files, which will be parsed again next "
+                "time: {1}".format(len(unparsed), ", ".join(unparsed[:20]))
+            )
+
+        # Drop the entries left over from older versions of the changed files.
+        for doc in parsed:
+            entry = stale[doc]
+            for digest in os.listdir(os.path.join(cache_path, doc)):
+                if digest != entry["hash"]:
+                    shutil.rmtree(entry_path(cache_path, doc, digest))
+
+    save_index(
+        cache_path,
+        {
+            doc: {field: entry[field] for field in INDEX_FIELDS}
+            for doc, entry in hashes.items()
+        },
+    )
+    rebuild_parser_output(file_path, cache_path, out_path, hashes)
+    return sorted(stale)
@@ -2,14 +2,26 @@ import pandas as pd
 from pandas import DataFrame
 import numpy as np
 import requests
+import io
+import mmap
 import os
 import subprocess
 from matplotlib import pyplot as plt
 import sys
-from typing import List
+from typing import Callable, Iterator, List, Optional, Tuple
 import zipfile
 
+from downloader import download_files, is_pdf
+from handoff import write_frame
+from instrument import record_rows, stage
+from manifest_store import NORMALIZED_FIELDS, load_manifests
+from parse_cache import parse_with_cache
+from parser_shards import parse_in_shards
+from paths import data_path
+
 DEFAULT_YEARS = [2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020]
+# Rows of the parsed disclosure tables to hold in memory at once
+DISCLOSURE_CHUNKSIZE = 200000
 
 
 ## Create map of possible dollar ranges in disclosure files to max/min values.
@@ -230,6 +242,118 @@ def parse_earned_income(row: pd.Series) -> pd.Series:
     return income_earned
 
 
+## Columnar versions of the parsers above, which work on whole columns at once
+## instead of building a pd.Series per row with DataFrame.apply.
+
+# Dollar strings that parse_exact_number handles unambiguously, e.g. $3,000,
+# $12,400.23 or $1.0. The capture group is the whole-dollar part.
+EXACT_NUMBER_PATTERN = r"^\$(,*[0-9][0-9,]*)(?:\.[0-9]{1,2})?$"
+
+
+def parse_exact_numbers(amounts: pd.Series) -> pd.Series:
+    """
+    Parses a column of dollar-value strings, with the same results as calling
+    parse_exact_number on each entry (nan for anything that isn't a number).
+    """
+    amounts = amounts.astype(object)
+    dollars = amounts.str.extract(EXACT_NUMBER_PATTERN, expand=False)
+    matched = dollars.notna()
+    numbers = pd.Series(np.nan, index=amounts.index)
+    numbers[matched] = (
+        dollars[matched].str.replace(",", "", regex=False).astype(np.int64)
+    )
+    # The odd ones ($.12, $1., $1.5,0, ...) are rare enough to just hand off
+    # to the scalar parser, which keeps the two exactly in sync.
+    leftover = ~matched & amounts.str.startswith("$").fillna(False).astype(bool)
+    if leftover.any():
+        numbers[leftover] = amounts[leftover].map(parse_exact_number)
+    return numbers
+
+
+def parse_ranges(amounts: pd.Series) -> DataFrame:
+    """
+    Maps a column of dollar strings to min/max values, either through range_map
+    or as an exact dollar value. Entries that are neither are left as nan.
+    """
+    in_range_map = amounts.isin(list(range_map))
+    mins = amounts.map({key: bounds[0] for key, bounds in range_map.items()})
+    maxs = amounts.map({key: bounds[1] for key, bounds in range_map.items()})
+    exact = parse_exact_numbers(amounts[~in_range_map])
+    return DataFrame({"min": mins.fillna(exact), "max": maxs.fillna(exact)})
+
+
+def _is_not_reported(amounts: pd.Series) -> pd.Series:
+    """
+    Whether each entry is blank or some form of "Not Applicable"/"Not Reported".
+    """
+    says_not = amounts.astype(object).str.contains("Not", regex=False)
+    return amounts.isna() | says_not.fillna(False).astype(bool)
+
+
+def _finish_ranges(ranges: DataFrame) -> DataFrame:
+    """
+    DataFrame.apply hands back integer columns unless something failed to parse,
+    so match that to keep the output identical to the row-wise parsers.
+    """
+    for col in ranges.columns:
+        if ranges[col].notna().all():
+            ranges[col] = ranges[col].astype(np.int64)
+    return ranges
+
+
+def parse_assets(assets: DataFrame) -> DataFrame:
+    """
+    Columnar parse_asset: returns the min/max asset values for every row.
+    """
+    ranges = parse_ranges(assets["value-of-asset"])
+    failed = ranges["min"].isna()
+    for file, val in zip(
+        assets.loc[failed, "file"], assets.loc[failed, "value-of-asset"]
+    ):
+        print("error parse asset:", file, val)
+    return _finish_ranges(ranges)
+
+
+def parse_liabilities(liabilities: DataFrame) -> DataFrame:
+    """
+    Columnar parse_liability: returns the min/max liability values for every row.
+    """
+    ranges = parse_ranges(liabilities["amount-of-liability"])
+    for val in liabilities.loc[ranges["min"].isna(), "amount-of-liability"]:
+        print("error parse liability:", val)
+    return _finish_ranges(ranges)
+
+
+def parse_unearned_incomes(assets: DataFrame) -> DataFrame:
+    """
+    Columnar parse_unearned_income. The common cases (a single range or exact
+    value in either year, or nothing reported) are handled column-wise; rows
+    where the two years got mashed together fall back to parse_unearned_income.
+    """
+    income = assets["income"]
+    prev_year = parse_ranges(assets["income_prev_year"])
+    this_year = parse_ranges(income)
+
+    # Previous year's income takes precedence over the current year.
+    use_prev_year = prev_year["min"].notna()
+    ranges = prev_year.where(use_prev_year, this_year)
+    ranges.loc[income == "over $5,000,000"] = 5000000
+
+    unparsed = ranges["min"].isna()
+    not_reported = _is_not_reported(income) & _is_not_reported(
+        assets["income_prev_year"]
+    )
+    ranges.loc[unparsed & not_reported] = 0
+
+    combined = unparsed & ~not_reported
+    if combined.any():
+        ranges.loc[combined] = (
+            assets[combined].apply(parse_unearned_income, axis=1).to_numpy(float)
+        )
+    return _finish_ranges(ranges.astype(np.float64))
+
+
+@stage
 def get_candidate_set(years: List[int]) -> DataFrame:
     """
     Download the manifest files for the selected years from the House
@@ -242,35 +366,22 @@ def get_candidate_set(years: List[int]) -> DataFrame:
     url_format = (
         "https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{year}FD.ZIP"
     )
-    if not os.path.exists("../data"):
-        os.makedirs("../data")
-    if not os.path.exists("../data/pfd"):
-        os.makedirs("../data/pfd")
-    if not os.path.exists("../data/pfd/manifests"):
-        os.makedirs("../data/pfd/manifests")
+    if not os.path.exists(data_path("pfd/manifests")):
+        os.makedirs(data_path("pfd/manifests"))
 
     print("Downloading the manifest files for these years:", years)
     downloaded_years = []
 
-    df_manifest = None
     for year in years:
         url = url_format.format(year=year)
-        dst = "../data/pfd/manifests/{year}FD.zip".format(year=year)
+        dst = data_path("pfd/manifests/{year}FD.zip".format(year=year))
         if not os.path.exists(dst):
             downloaded_years.append(year)
             r = requests.get(url, stream=True)
             with open(dst, "wb") as f:
                 f.write(r.content)
             with zipfile.ZipFile(dst, "r") as zipped:
-                zipped.extractall("../data/pfd/manifests")
-
-        df_year = pd.read_csv(
-            "../data/pfd/manifests/{year}FD.txt".format(year=year), delimiter="\t"
-        )
-        if df_manifest is None:
-            df_manifest = df_year
-        else:
-            df_manifest = pd.concat([df_manifest, df_year])
+                zipped.extractall(data_path("pfd/manifests"))
 
     print(
         "Downloaded {0} manifests; the remainder already exist.".format(
@@ -278,8 +389,9 @@ def get_candidate_set(years: List[int]) -> DataFrame:
         )
     )
 
+    # Parsed and typed (DocID is already an int32) just once, in manifest_store
+    df_manifest = load_manifests(years).drop(columns=NORMALIZED_FIELDS)
     # A little bit of cleanup
-    df_manifest = df_manifest.astype({"DocID": np.int32})
     df_manifest.drop_duplicates(inplace=True)
     # We only want initial filings and incumbent annual filings (probably)
     df_manifest = df_manifest[df_manifest["FilingType"].isin(["C", "O"])]
@@ -287,133 +399,369 @@ def get_candidate_set(years: List[int]) -> DataFrame:
     return df_manifest
 
 
-def download_disclosure_files(df: DataFrame) -> None:
+@stage
+def download_disclosure_files(
+    df: DataFrame,
+    workers: int = 8,
+    url_format: str = "http://clerk.house.gov/public_disc/financial-pdfs/{year}/{doc}.pdf",
+) -> None:
     """
     Download the disclosure files for the selected candidates from the House
     Clerk's website database, and store them in the raw_disclosures folder.
+    Files are fetched concurrently, and anything that doesn't come back as a
+    complete PDF is left out so the next run tries it again. A manifest of this
+    run's downloads is written to pfd/download_manifest.csv in the data root.
     """
-    url_format = "http://clerk.house.gov/public_disc/financial-pdfs/{year}/{doc}.pdf"
-    if not os.path.exists("../data"):
-        os.makedirs("../data")
-    if not os.path.exists("../data/pfd"):
-        os.makedirs("../data/pfd")
-    if not os.path.exists("../data/pfd/raw_disclosures"):
-        os.makedirs("../data/pfd/raw_disclosures")
+    if not os.path.exists(data_path("pfd/raw_disclosures")):
+        os.makedirs(data_path("pfd/raw_disclosures"))
 
     print("Downloading {0} disclosure files. This will take a while...".format(len(df)))
 
-    downloaded = 0
+    jobs = []
+    doc_ids = []
     skipped = 0
-    for _, row in df.iterrows():
-        if str(row.DocID)[0] in ["8", "9"]:
+    for year, doc_id in zip(df["Year"], df["DocID"]):
+        if str(doc_id)[0] in ["8", "9"]:
             # We can't parse the hand-written ones, so skip download to save space/time.
             skipped += 1
             continue
-        url = url_format.format(year=row.Year, doc=row.DocID)
+        url = url_format.format(year=year, doc=doc_id)
         # NB: it's okay to mash up all the filings together into one folder
         # because DocID is unique across all years 2012-2020.
-        dst = "../data/pfd/raw_disclosures/{doc}.pdf".format(doc=row.DocID)
-        if not os.path.exists(dst):
-            downloaded += 1
-            r = requests.get(url, stream=True)
-            with open(dst, "wb") as f:
-                f.write(r.content)
+        dst = data_path("pfd/raw_disclosures/{doc}.pdf".format(doc=doc_id))
+        if not is_pdf(dst):
+            jobs.append((url, dst))
+            doc_ids.append(doc_id)
+
+    df_results = download_files(jobs, workers=workers)
+    df_results.insert(0, "DocID", doc_ids)
+    df_results.to_csv(data_path("pfd/download_manifest.csv"), index=False)
+
+    failed = df_results["error"].notna().sum()
+    record_rows(rows_out=len(jobs) - failed)
     print(
-        "Download complete. Downloaded {0} files; skipped {1}; {2} were already downloaded".format(
-            downloaded, skipped, len(df) - downloaded - skipped
+        "Download complete. Downloaded {0} files; {1} failed; skipped {2}; {3} were already downloaded".format(
+            len(jobs) - failed, failed, skipped, len(df) - len(jobs) - skipped
         )
     )
 
 
-def parse_disclosure_files() -> DataFrame:
+@stage
+def parse_disclosure_files(
+    workers: int = os.cpu_count(),
+    chunksize: Optional[int] = None,
+) -> DataFrame:
     """
     Converts the pdf disclosure files into a useable dataframe indexed by DocID.
     The house-pfd-parser gets most of the way there, then we do some additional
     manipulation to clean everything up.
+
+    With a chunksize, the parsed tables are streamed through chunksize rows at
+    a time and only their per-file sums are kept, so memory stays bounded no
+    matter how many years are parsed; the result is the same.
     """
-    # Run the house-pfd-parser subprocess.
-    parse_disclosure_files_js()
+    # Run the parser on whatever hasn't been parsed before.
+    parse_with_cache(
+        data_path("pfd/raw_disclosures/"),
+        data_path("pfd/parse_cache/"),
+        data_path("pfd/parsed_disclosures/"),
+        lambda file_path, out_path: parse_disclosure_files_js(
+            workers, file_path, out_path
+        ),
+    )
+
+    if chunksize is not None:
+        return merge_disclosure_sums(
+            *[
+                stream_sums_by_file(
+                    data_path("pfd/parsed_disclosures/" + name),
+                    clean,
+                    columns,
+                    chunksize,
+                )
+                for name, clean, columns in DISCLOSURE_TABLES
+            ]
+        )
 
-    assets = open_disclosure_file(
-        "../data/pfd/parsed_disclosures/assets-and-unearned-income.csv"
+    assets, no_assets = open_disclosure_file(
+        data_path("pfd/parsed_disclosures/assets-and-unearned-income.csv")
     )
-    assets.rename(columns={"income.1": "income_prev_year"}, inplace=True)
-    liabilities = open_disclosure_file("../data/pfd/parsed_disclosures/liabilities.csv")
-    earned_income = open_disclosure_file(
-        "../data/pfd/parsed_disclosures/earned-income.csv"
+    liabilities, no_liabilities = open_disclosure_file(
+        data_path("pfd/parsed_disclosures/liabilities.csv")
     )
-
-    # Clean up non-disclosed/empty data
-    assets.drop(assets[assets.file.str.contains("None disclosed")].index, inplace=True)
-    liabilities.drop(
-        liabilities[liabilities.file.str.contains("None disclosed")].index, inplace=True
+    earned_income, no_earned_income = open_disclosure_file(
+        data_path("pfd/parsed_disclosures/earned-income.csv")
+    )
+    print(
+        "Disclosed nothing: {0} for assets, {1} for liabilities, {2} for earned income".format(
+            len(no_assets), len(no_liabilities), len(no_earned_income)
+        )
     )
-    earned_income.drop(
-        earned_income[earned_income.file.str.contains("None disclosed")].index,
-        inplace=True,
+    return merge_disclosure_files(
+        clean_assets(assets),
+        clean_liabilities(liabilities),
+        clean_earned_income(earned_income),
     )
 
+
+def clean_assets(assets: DataFrame) -> DataFrame:
+    """
+    Drop the empty rows from the parsed assets and unearned income table, and
+    parse the ranges of the asset values and incomes. (Like the other clean_
+    functions, this expects the "None disclosed" rows to be gone already.)
+    """
+    assets = assets.rename(columns={"income.1": "income_prev_year"})
     # We should really manually verify the 120 or so NaNs, but whatever
-    assets = assets[~(assets["value-of-asset"].isna())]
+    assets = assets[~(assets["value-of-asset"].isna())].copy()
+
+    # Parse ranges for assets
+    assets[["min_asset", "max_asset"]] = parse_assets(assets)
+    # Parse ranges for unearned income
+    assets[["min_unearned_income", "max_unearned_income"]] = parse_unearned_incomes(
+        assets
+    )
+
+    # test for correctly mapping everything
+    assert assets.min_asset.isna().sum() == 0
+    assert assets.max_asset.isna().sum() == 0
+    assert assets.min_unearned_income.isna().sum() == 0
+    assert assets.max_unearned_income.isna().sum() == 0
+    return assets
+
+
+def clean_liabilities(liabilities: DataFrame) -> DataFrame:
+    """
+    Drop the empty rows from the parsed liabilities table and parse the ranges
+    of the amounts.
+    """
     # 10000624 literally has NaN-valued liability entries...
     liabilities = liabilities[
         ~(
             liabilities.file.isin(["10000624"])
             & (liabilities["amount-of-liability"].isna())
         )
-    ]
+    ].copy()
 
-    # Parse ranges for assets and liabilities
-    assets[["min_asset", "max_asset"]] = assets.apply(parse_asset, axis=1)
-    liabilities[["min_liability", "max_liability"]] = liabilities.apply(
-        parse_liability, axis=1
-    )
+    # Parse ranges for liabilities
+    liabilities[["min_liability", "max_liability"]] = parse_liabilities(liabilities)
 
-    # Parse ranges for unearned income
-    assets[["min_unearned_income", "max_unearned_income"]] = assets.apply(
-        parse_unearned_income, axis=1
-    )
+    assert liabilities.min_liability.isna().sum() == 0
+    assert liabilities.max_liability.isna().sum() == 0
+    return liabilities
+
+
+def clean_earned_income(earned_income: DataFrame) -> DataFrame:
+    """
+    Drop the empty rows from the parsed earned income table and parse the
+    amounts.
+    """
+    earned_income = earned_income.copy()
 
     # Parse earned income data
-    earned_income[["income_ytd", "income_prev_year"]] = earned_income.amount.str.split(
-        " ", n=1, expand=True
-    )
+    amounts = earned_income.amount.str.split(" ", n=1, expand=True)
+    if 1 not in amounts:
+        # Nothing had two amounts (e.g. a chunk of blank ones)
+        amounts[1] = None
+    earned_income[["income_ytd", "income_prev_year"]] = amounts
     earned_income["income_earned"] = earned_income.apply(parse_earned_income, axis=1)
 
-    # test for correctly mapping everything
-    assert liabilities.min_liability.isna().sum() == 0
-    assert liabilities.max_liability.isna().sum() == 0
-    assert assets.min_asset.isna().sum() == 0
-    assert assets.max_asset.isna().sum() == 0
-    assert assets.min_unearned_income.isna().sum() == 0
-    assert assets.max_unearned_income.isna().sum() == 0
     assert earned_income.income_earned.isna().sum() == 0
-
-    return merge_disclosure_files(assets, liabilities, earned_income)
+    return earned_income
 
 
 ## Parse disclosure files:
-def parse_disclosure_files_js():
+def parse_disclosure_files_js(
+    workers: int = 1,
+    file_path: str = data_path("pfd/raw_disclosures/"),
+    out_path: str = data_path("pfd/parsed_disclosures/"),
+):
     """
     Run the house-pfd-parse as a subprocess, which parses the pdfs in the 
-    raw_disclosures folder into an almost-useable state.
+    file_path folder into an almost-useable state in out_path. With more than
+    one worker, the pdfs are split into shards that are parsed in parallel.
     """
+    if workers > 1:
+        parse_in_shards(file_path, out_path, workers)
+        return
     subprocess.run(
-        "cd house-pfd-parser && npm start",
+        "cd house-pfd-parser && npm start -- {0}/ {1}/".format(
+            os.path.abspath(file_path), os.path.abspath(out_path)
+        ),
         shell=True,
         stdout=sys.stdout,
         stderr=subprocess.STDOUT,
+        check=True,
     )
 
 
-def open_disclosure_file(filename) -> DataFrame:
-    start = 0
-    with open(filename) as f:
-        for line in f:
-            if "file,page" in line:
-                break
-            start += 1
-    return pd.read_csv(filename, skiprows=start)
+HEADER = b"file,page"
+NONE_DISCLOSED = b" - None disclosed"
+
+
+# The cleaned-up tables are handed to read_csv in blocks of at most this many bytes
+BLOCK_BYTES = 1 << 20
+
+
+def none_disclosed(line: bytes) -> Optional[bytes]:
+    """
+    The DocID if line is a "{DocID} - None disclosed" marker (possibly followed
+    by empty fields), or None otherwise.
+    """
+    line = line.rstrip(b"\r\n").rstrip(b",")
+    if line.endswith(NONE_DISCLOSED) and b"," not in line:
+        return line[: -len(NONE_DISCLOSED)]
+    return None
+
+
+def disclosure_blocks(filename, no_disclosures: List[bytes]) -> Iterator[bytes]:
+    """
+    The bytes of a table written by the house-pfd-parser, split up in a single
+    pass over the (memory-mapped) file: the "file,page" header, then the rest
+    with any repeated headers (as left by concatenating several parser runs) and
+    the "{DocID} - None disclosed" lines cut out. Everything up to the first
+    header is skipped. The DocIDs of the documents that disclosed nothing are
+    added to no_disclosures on the way.
+    """
+    with open(filename, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+
+        def line_at(i):
+            start = mm.rfind(b"\n", 0, i) + 1
+            end = mm.find(b"\n", i)
+            return start, len(mm) if end < 0 else end + 1
+
+        def between(start, end):
+            for i in range(start, end, BLOCK_BYTES):
+                yield mm[i : min(i + BLOCK_BYTES, end)]
+
+        if mm.find(HEADER) < 0:
+            raise ValueError("No file,page header in {0}".format(filename))
+        header_start, pos = line_at(mm.find(HEADER))
+        yield mm[header_start:pos]
+        # Documents that had nothing to disclose before the first one that did
+        for line in mm[:header_start].splitlines():
+            if none_disclosed(line) is not None:
+                no_disclosures.append(none_disclosed(line))
+
+        # Only the lines to cut out are looked at in Python; everything in
+        # between is passed on in bulk. Each search picks up where it left off.
+        marker = mm.find(NONE_DISCLOSED, pos)
+        repeat = mm.find(b"\n" + HEADER, pos - 1)
+        while marker >= 0 or repeat >= 0:
+            if marker < 0 or 0 <= repeat < marker:
+                start, end = line_at(repeat + 1)
+            else:
+                start, end = line_at(marker)
+                doc = none_disclosed(mm[start:end])
+                if doc is None:
+                    # Just something that happens to say "None disclosed"
+                    marker = mm.find(NONE_DISCLOSED, marker + 1)
+                    continue
+                no_disclosures.append(doc)
+            yield from between(pos, start)
+            pos = end
+            if marker >= 0 and marker < pos:
+                marker = mm.find(NONE_DISCLOSED, pos)
+            if repeat >= 0 and repeat < pos - 1:
+                repeat = mm.find(b"\n" + HEADER, pos - 1)
+        yield from between(pos, len(mm))
+
+
+class _Blocks(io.RawIOBase):
+    """A binary stream of the bytes in blocks, one after the other."""
+
+    def __init__(self, blocks: Iterator[bytes]):
+        self.blocks = blocks
+        self.block = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self.block) == 0:
+            block = next(self.blocks, None)
+            if block is None:
+                return 0
+            self.block = memoryview(block)
+        size = min(len(b), len(self.block))
+        b[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+
+
+def read_disclosure_file(filename, no_disclosures: List[bytes], **kwargs):
+    """
+    pd.read_csv (with any of its keyword arguments, e.g. chunksize) of a table
+    written by the house-pfd-parser, as split up by disclosure_blocks. Every
+    column is read as str, even in chunks where one happens to be blank or all
+    numbers, as the clean_ functions parse them from strings.
+    """
+    blocks = _Blocks(disclosure_blocks(filename, no_disclosures))
+    return pd.read_csv(io.BufferedReader(blocks), dtype=str, **kwargs)
+
+
+def open_disclosure_file(filename) -> Tuple[DataFrame, List[str]]:
+    """
+    Load a table written by the house-pfd-parser. Returns the table, and the
+    DocIDs of the documents that disclosed nothing in it.
+    """
+    no_disclosures = []
+    df = read_disclosure_file(filename, no_disclosures)
+    return df, [doc.decode() for doc in no_disclosures]
+
+
+# The parsed tables, how to clean each of them up, and the columns to sum by file.
+DISCLOSURE_TABLES = [
+    (
+        "assets-and-unearned-income.csv",
+        clean_assets,
+        ["min_asset", "max_asset", "min_unearned_income", "max_unearned_income"],
+    ),
+    ("liabilities.csv", clean_liabilities, ["min_liability", "max_liability"]),
+    ("earned-income.csv", clean_earned_income, ["income_earned"]),
+]
+
+
+def sum_by_file(df: DataFrame, columns: List[str]) -> DataFrame:
+    return df[["file"] + columns].groupby("file").sum()
+
+
+def stream_sums_by_file(
+    filename,
+    clean: Callable[[DataFrame], DataFrame],
+    columns: List[str],
+    chunksize: int,
+) -> DataFrame:
+    """
+    sum_by_file(clean(open_disclosure_file(filename)[0]), columns), but reading the
+    file chunksize rows at a time. The parser writes each document's rows
+    together, so the rows of the last document in a chunk are held back for
+    the next one; that way every document is summed in one go, in the same
+    order, and the (floating point) sums come out exactly the same.
+    """
+    partials = []
+    held_back = None
+    for chunk in read_disclosure_file(filename, [], chunksize=chunksize):
+        if len(chunk) == 0:
+            continue
+        if held_back is not None:
+            chunk = pd.concat([held_back, chunk])
+        last = chunk["file"].iloc[-1]
+        held_back = chunk[chunk["file"] == last]
+        chunk = chunk[chunk["file"] != last]
+        if len(chunk) > 0:
+            partials.append(sum_by_file(clean(chunk), columns))
+    if held_back is not None:
+        partials.append(sum_by_file(clean(held_back), columns))
+
+    # (Chunks with nothing left after cleaning up would mess up the dtypes)
+    partials = [sums for sums in partials if len(sums) > 0]
+
+    if len(partials) == 0:
+        return DataFrame(columns=columns, index=pd.Index([], name="file"))
+    # Documents only show up in more than one part if their rows weren't together
+    return pd.concat(partials).groupby(level=0).sum()
 
 
 def merge_disclosure_files(
@@ -422,25 +770,25 @@ def merge_disclosure_files(
     """
     Merge all disclosure categies together according to their file code.
     """
-    assets_by_file = (
-        assets[
-            [
-                "file",
-                "min_asset",
-                "max_asset",
-                "min_unearned_income",
-                "max_unearned_income",
-            ]
+    return merge_disclosure_sums(
+        *[
+            sum_by_file(df, columns)
+            for df, (_, _, columns) in zip(
+                [assets, liabilities, earned_income], DISCLOSURE_TABLES
+            )
         ]
-        .groupby("file")
-        .sum()
-    )
-    liabilities_by_file = (
-        liabilities[["file", "min_liability", "max_liability"]].groupby("file").sum()
-    )
-    earned_income_by_file = (
-        earned_income[["file", "income_earned"]].groupby("file").sum()
     )
+
+
+def merge_disclosure_sums(
+    assets_by_file: DataFrame,
+    liabilities_by_file: DataFrame,
+    earned_income_by_file: DataFrame,
+) -> DataFrame:
+    """
+    Join the per-file sums of each disclosure category together, and work out
+    the wealth and income estimates from them.
+    """
     df_pfd = liabilities_by_file.join(assets_by_file, how="outer").join(
         earned_income_by_file, how="outer"
     )
@@ -458,13 +806,15 @@ def merge_disclosure_files(
 
 
 def save_disclosure_data(df: DataFrame):
-    df.to_csv("../data/pfd/pfd_final.csv")
+    # The file names are DocIDs, which the crosswalk joins on as numbers
+    df.index = df.index.astype(np.int64)
+    write_frame(df, data_path("pfd/pfd_final.csv"))
 
 
-def main(years: List[int]):
+def main(years: List[int] = DEFAULT_YEARS):
     candidate_df = get_candidate_set(years)
     download_disclosure_files(candidate_df)
-    df_pfd = parse_disclosure_files()
+    df_pfd = parse_disclosure_files(chunksize=DISCLOSURE_CHUNKSIZE)
     save_disclosure_data(df_pfd)
 
 
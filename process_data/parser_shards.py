@@ -0,0 +1,149 @@
+# Runs several house-pfd-parser processes at once, each on its own shard of the
+# raw disclosures, and merges the part files they write back together.
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+PARSER_DIR = "house-pfd-parser"
+OUTPUT_FILES = [
+    "assets-and-unearned-income.csv",
+    "liabilities.csv",
+    "earned-income.csv",
+    "no-content.csv",
+]
+
+
+def shard_files(file_path: str, num_shards: int) -> List[List[str]]:
+    """
+    Split the PDFs in file_path into num_shards lists of roughly equal total
+    size, so that every worker gets about the same amount of parsing to do.
+    """
+    files = [f for f in os.listdir(file_path) if ".pdf" in f.lower()]
+    files.sort(key=lambda f: os.path.getsize(os.path.join(file_path, f)), reverse=True)
+    shards = [[] for _ in range(num_shards)]
+    sizes = [0] * num_shards
+    # Greedily hand out the biggest remaining file to the lightest shard.
+    for f in files:
+        smallest = sizes.index(min(sizes))
+        shards[smallest].append(f)
+        sizes[smallest] += os.path.getsize(os.path.join(file_path, f))
+    return [sorted(shard) for shard in shards if len(shard) > 0]
+
+
+def link_shard(file_path: str, files: List[str], shard_path: str):
+    """
+    Populate shard_path with links to files, copying if links aren't supported.
+    """
+    os.makedirs(shard_path)
+    for f in files:
+        src = os.path.abspath(os.path.join(file_path, f))
+        dst = os.path.join(shard_path, f)
+        try:
+            os.symlink(src, dst)
+        except OSError:
+            shutil.copy(src, dst)
+
+
+def part_file(name: str, part: int) -> str:
+    """
+    What a parser run as part `part` calls its output file `name` (as in
+    house-pfd-parser's TableSink).
+    """
+    return "{0}.part-{1}.csv".format(name[: -len(".csv")], part)
+
+
+def run_shards(file_path: str, work_path: str, workers: int) -> Tuple[str, int]:
+    """
+    Parse the PDFs in file_path with up to `workers` parser processes at once.
+    Each shard gets its own input folder under work_path, and writes its part
+    of the output into work_path/parts. Returns that folder and the number of
+    parts.
+    """
+    if os.path.exists(work_path):
+        shutil.rmtree(work_path)
+    shards = shard_files(file_path, workers)
+    print(
+        "Parsing {0} files in {1} shards...".format(
+            sum(len(shard) for shard in shards), len(shards)
+        )
+    )
+
+    subprocess.run("cd {0} && npm run build".format(PARSER_DIR), shell=True, check=True)
+    start = time.perf_counter()
+    processes = []
+    parts_path = os.path.abspath(os.path.join(work_path, "parts"))
+    os.makedirs(parts_path)
+    for i, shard in enumerate(shards):
+        shard_in = os.path.abspath(os.path.join(work_path, str(i), "input"))
+        link_shard(file_path, shard, shard_in)
+        # NB: the parser concatenates these with file names, so they need the "/".
+        processes.append(
+            subprocess.Popen(
+                ["node", "./build/index.js", shard_in + "/", parts_path + "/", str(i)],
+                cwd=PARSER_DIR,
+                stdout=subprocess.DEVNULL,
+                stderr=sys.stderr,
+            )
+        )
+
+    failed = [i for i, p in enumerate(processes) if p.wait() != 0]
+    if len(failed) > 0:
+        raise RuntimeError("Parser shards {0} failed".format(failed))
+    print("Parsed all shards in {0:.1f}s".format(time.perf_counter() - start))
+    return parts_path, len(shards)
+
+
+def merge_csv_parts(parts: List[str], dst: str, header_prefix: str):
+    """
+    Concatenate CSV files that may each carry their own header line (the first
+    line starting with header_prefix), keeping a single header at the top.
+    """
+    header = None
+    with open(dst + ".tmp", "w") as out:
+        for part in parts:
+            if not os.path.exists(part):
+                continue
+            with open(part) as f:
+                for line in f:
+                    if line.startswith(header_prefix):
+                        if header is None:
+                            header = line
+                        continue
+                    out.write(line)
+    with open(dst, "w") as out:
+        if header is not None:
+            out.write(header)
+        with open(dst + ".tmp") as f:
+            shutil.copyfileobj(f, out)
+    os.remove(dst + ".tmp")
+
+
+def merge_shard_outputs(parts_path: str, parts: int, out_path: str):
+    """
+    Merge the part files in parts_path into out_path, laid out just as a single
+    parser run would have left them.
+    """
+    if os.path.exists(out_path):
+        shutil.rmtree(out_path)
+    os.makedirs(out_path)
+    for name in OUTPUT_FILES:
+        header_prefix = "File" if name == "no-content.csv" else "file,page"
+        merge_csv_parts(
+            [os.path.join(parts_path, part_file(name, i)) for i in range(parts)],
+            os.path.join(out_path, name),
+            header_prefix,
+        )
+
+
+def parse_in_shards(file_path: str, out_path: str, workers: int):
+    """
+    Run the house-pfd-parser over file_path with `workers` processes, leaving
+    the merged output CSVs in out_path.
+    """
+    work_path = os.path.join(os.path.dirname(os.path.normpath(out_path)), "shards")
+    parts_path, parts = run_shards(file_path, work_path, workers)
+    merge_shard_outputs(parts_path, parts, out_path)
+    shutil.rmtree(work_path)
@@ -0,0 +1,13 @@
+# Where the pipeline reads and writes its data. This is the top-level data folder
+# as seen from process_data/ (where the scripts are run from) unless the
+# DDRL_DATA_ROOT environment variable points somewhere else.
+import os
+
+DATA_ROOT = os.environ.get("DDRL_DATA_ROOT", "../data")
+
+
+def data_path(path: str) -> str:
+    """
+    path (e.g. "pfd/pfd_final.csv") inside the data root.
+    """
+    return os.path.join(DATA_ROOT, path)
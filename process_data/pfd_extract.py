@@ -0,0 +1,522 @@
+# A Python port of house-pfd-parser, so the disclosures can be parsed in-process
+# (one pdf per worker of a process pool) instead of through node and CSV files.
+# Every step follows its TypeScript counterpart: the text is read the way pdf.js
+# does, and parse_page, fix_rows_that_cross_pages and write_filing do what
+# parsePage.ts, fixRowsThatCrossPages.ts and createTables.ts do, quirks and all,
+# so the output files should be the same. That's yet to be checked on real
+# filings, so parse_pfds.py doesn't use it until check_against_js passes on a
+# sample of them. Needs pdfminer.six (`pip install pdfminer.six`).
+#
+# `python pfd_extract.py [FOLDER]` runs both parsers on the pdfs in FOLDER
+# (../data/pfd/fixtures/ by default) and lists the documents they disagree on.
+import csv
+import os
+import re
+import shutil
+import sys
+import tempfile
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from pandas import DataFrame
+
+from parse_cache import TABLE_FILES, doc_id
+from parser_shards import parse_in_shards
+from paths import data_path
+
+try:
+    from pdfminer.pdfdevice import PDFTextDevice
+    from pdfminer.pdffont import PDFUnicodeNotDefined
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.utils import apply_matrix_pt, mult_matrix
+
+    HAVE_PDFMINER = True
+except ImportError:
+    HAVE_PDFMINER = False
+
+# Column headers are the only text in this size
+HEADER_SIZE = 9.75
+# Smaller text is never a value
+MIN_VALUE_SIZE = 9
+# How far apart (vertically) the values of one row can be
+ROW_HEIGHT = 12
+STOP_MARKER = "exclusions of spouse, dependent, or trust information"
+SCHEDULE = re.compile(r"schedule \w:", re.ASCII)
+
+# pdf.js's thresholds (as multiples of the width of a space) for putting spaces
+# into gaps in a line of text, and for starting a new text item
+SPACE_FACTOR = 0.3
+MULTI_SPACE_FACTOR = 1.5
+MULTI_SPACE_FACTOR_MAX = 4
+
+# What pdf.js calls a text item: a run of text and where it starts. size is its
+# transform[0], and x and y its transform[4] and transform[5].
+TextItem = namedtuple("TextItem", ["text", "size", "x", "y"])
+
+# A parsed pdf: its tables in the order they appear, as (name, DataFrame) with
+# the columns of the parser's CSV header (or None if nothing was disclosed),
+# and the number of pages without any text.
+Filing = namedtuple("Filing", ["pdf_path", "doc", "tables", "empty_pages"])
+
+
+if HAVE_PDFMINER:
+
+    class _TextRun:
+        def __init__(self, text_item: TextItem, space: float):
+            self.item = text_item
+            self.chars = []
+            self.space = space
+            # (pdf.js can't tell how wide a gap is without the width of a space)
+            self.break_allowed = space > 0
+
+        def add_fake_spaces(self, width: float):
+            if width < self.space * SPACE_FACTOR:
+                return
+            if width < self.space * MULTI_SPACE_FACTOR:
+                self.chars.append(" ")
+                return
+            self.chars.extend(" " * int(round(width / self.space)))
+
+    class _TextItemDevice(PDFTextDevice):
+        """
+        Collects a page's text items like pdf.js's getTextContent does: text
+        shown one string after another is one item, until the font changes, the
+        text moves to another line or there's too wide a gap.
+        """
+
+        def __init__(self, rsrcmgr):
+            super().__init__(rsrcmgr)
+            self.items = []
+            self.run = None
+
+        def begin_page(self, page, ctm):
+            self.items = []
+            self.run = None
+
+        def end_page(self, page):
+            self.flush()
+
+        def flush(self):
+            if self.run is not None:
+                self.items.append(self.run.item._replace(text="".join(self.run.chars)))
+                self.run = None
+
+        def start_run(self, textstate):
+            if self.run is not None:
+                return
+            matrix = mult_matrix(textstate.matrix, self.ctm)
+            x, y = textstate.linematrix
+            x, y = apply_matrix_pt(matrix, (x, y + textstate.rise))
+            fontsize = textstate.fontsize
+            size = matrix[0] * fontsize * textstate.scaling * 0.01
+            space = textstate.font.char_width(32) * fontsize
+            self.run = _TextRun(TextItem("", size, x, y), space)
+
+        def render_string(self, textstate, seq, ncs, graphicstate):
+            for obj in seq:
+                self.start_run(textstate)
+                if isinstance(obj, bytes):
+                    super().render_string(textstate, [obj], ncs, graphicstate)
+                elif isinstance(obj, (int, float)):
+                    advance = -obj * 0.001 * textstate.fontsize
+                    x, y = textstate.linematrix
+                    textstate.linematrix = (x + advance * textstate.scaling * 0.01, y)
+                    if self.run.break_allowed and advance > (
+                        self.run.space * MULTI_SPACE_FACTOR_MAX
+                    ):
+                        self.flush()
+                    elif advance > 0:
+                        self.run.add_fake_spaces(advance)
+
+        def render_char(
+            self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate
+        ):
+            try:
+                self.run.chars.append(font.to_unichr(cid))
+            except PDFUnicodeNotDefined:
+                pass
+            return font.char_width(cid) * fontsize * scaling
+
+    class _TextItemInterpreter(PDFPageInterpreter):
+        """
+        Ends the current text item wherever pdf.js would. (pdfminer passes each
+        operator as many operands as its method takes, so these can't be
+        generated.)
+        """
+
+        def do_BT(self):
+            self.device.flush()
+            super().do_BT()
+
+        def do_Tf(self, fontid, fontsize):
+            self.device.flush()
+            super().do_Tf(fontid, fontsize)
+
+        def do_Tm(self, a, b, c, d, e, f):
+            self.device.flush()
+            super().do_Tm(a, b, c, d, e, f)
+
+        def do_T_a(self):
+            self.device.flush()
+            super().do_T_a()
+
+        def do_TD(self, tx, ty):
+            self.device.flush()
+            super().do_TD(tx, ty)
+
+        def do_TL(self, leading):
+            self.device.flush()
+            super().do_TL(leading)
+
+        def do_Ts(self, rise):
+            self.device.flush()
+            super().do_Ts(rise)
+
+        def do_Tz(self, scale):
+            self.device.flush()
+            super().do_Tz(scale)
+
+        def do_gs(self, name):
+            self.device.flush()
+            super().do_gs(name)
+
+        def do_Do(self, xobjid):
+            self.device.flush()
+            super().do_Do(xobjid)
+
+        def do_Td(self, tx, ty):
+            # A small step to the right on the same line just adds spaces
+            run = self.device.run
+            if (
+                run is not None
+                and ty == 0
+                and 0 < tx <= run.space * MULTI_SPACE_FACTOR_MAX
+            ):
+                run.add_fake_spaces(tx - self.textstate.linematrix[0])
+            else:
+                self.device.flush()
+            super().do_Td(tx, ty)
+
+
+def read_text_items(pdf_path: str) -> Iterator[List[TextItem]]:
+    """
+    The text items on each page of the pdf. Pages are only read as they're
+    asked for, so the ones after the parser stops aren't read at all.
+    """
+    if not HAVE_PDFMINER:
+        raise ImportError("Parsing the disclosures in Python needs pdfminer.six")
+    rsrcmgr = PDFResourceManager()
+    device = _TextItemDevice(rsrcmgr)
+    interpreter = _TextItemInterpreter(rsrcmgr, device)
+    with open(pdf_path, "rb") as f:
+        for page in PDFPage.get_pages(f):
+            interpreter.process_page(page)
+            yield device.items
+
+
+def slugify(name: str) -> str:
+    return re.sub(r"[ ,]+", "-", name.lower())
+
+
+class Column:
+    def __init__(self, name: str, slug: str, x: Optional[float] = None):
+        self.name = name
+        self.slug = slug
+        self.x = x
+
+
+class Table:
+    """
+    One schedule of a disclosure: its columns (page first, as it has no x) and
+    its rows, which map column slugs to values.
+    """
+
+    def __init__(self, part: str, name: str):
+        self.part = part
+        self.name = name
+        self.cols = [Column("page", "page")]
+        self.rows = []
+
+    def add_header(self, item: TextItem):
+        """
+        Start a column, or add to the name of the one already at item's x.
+        """
+        for col in self.cols:
+            if col.x == item.x:
+                if item.text not in col.name:
+                    col.name += " " + item.text
+                    col.slug = slugify(col.name)
+                return
+        if item.text == "income":
+            # A table can have two income columns, which need different slugs
+            # until the header is written (see reformat_headers)
+            name = "income*{0}*".format(uuid.uuid4())
+            slug = "income*{0}*".format(uuid.uuid4())
+        else:
+            name = item.text
+            slug = slugify(item.text)
+        self.cols.append(Column(name, slug, item.x))
+
+    def add_value(self, item: TextItem, page_num: int, row_y: float) -> float:
+        """
+        Put item's text in the column at its x, starting a new row if it's far
+        enough below the last value. Returns the y of the last value.
+        """
+        for i, col in enumerate(self.cols):
+            if col.x != item.x:
+                continue
+            if (i > 0 and abs(item.y - row_y) > ROW_HEIGHT) or len(self.rows) == 0:
+                self.rows.append({})
+            row = self.rows[-1]
+            row["page"] = page_num
+            if col.slug in row:
+                row[col.slug] += " " + item.text
+            else:
+                row[col.slug] = item.text
+            row_y = item.y
+        return row_y
+
+
+def parse_page(page_num: int, items: List[TextItem], tables: List[Table]) -> bool:
+    """
+    parsePage: add the tables a page starts, and its rows, to tables. The
+    items are put into lines by their y, from the top of the page down, and
+    each line is a schedule's title, column headers or values. Returns
+    ignoreRest: whether the page reached the stop marker (or a schedule after
+    schedule I), after which the rest of the document isn't parsed.
+    """
+    lines = {}
+    for item in items:
+        lines.setdefault(item.y, []).append(item)
+
+    row_y = 0
+    for y in sorted(lines, reverse=True):
+        line = sorted(lines[y], key=lambda item: item.x)
+        string = "".join(item.text for item in line).lower()
+        if string == STOP_MARKER:
+            return True
+        if SCHEDULE.search(string):
+            if len(tables) > 0 and tables[-1].part == "schedule i":
+                return True
+            pieces = string.split(": ")
+            name = pieces[1] if len(pieces) > 1 else ""
+            tables.append(Table(pieces[0], name or pieces[0]))
+            continue
+        if len(tables) == 0:
+            continue
+        table = tables[-1]
+        for item in line:
+            if item.size == HEADER_SIZE:
+                table.add_header(item)
+            elif item.size >= MIN_VALUE_SIZE:
+                row_y = table.add_value(item, page_num, row_y)
+    return False
+
+
+def _js_add(value, other) -> str:
+    """
+    value + other in JavaScript, for a value that may be missing or a number.
+    """
+    return ("undefined" if value is None else str(value)) + other
+
+
+def fix_rows_that_cross_pages(table: Table, file_name: str) -> Table:
+    """
+    fixRowsThatCrossPages: rows cut off by a page break are merged back
+    together, in one pass. The row after one with a value ending in "-" is
+    appended to it if it's on another page, and so are the rows with just one
+    value at the top of a page, however many there are; either way, they go
+    into the last row that's kept. Also sets every row's file.
+    """
+    to_delete = set()
+    kept_row = None
+    kept_page = None
+    # The row before, as it was before anything was appended to it
+    previous_keys = []
+    previous_page = None
+    previous_cut_off = False
+
+    for index, row in enumerate(table.rows):
+        keys = list(row)
+        page = row.get("page")
+        has_page = "page" in keys
+        cut_off = has_page and any(
+            isinstance(row[key], str) and row[key].endswith("-") for key in keys
+        )
+        if has_page and kept_row is not None:
+            if previous_cut_off and page != previous_page:
+                for k in previous_keys:
+                    suffix = " " + _js_add(row[k], "") if k in row else ""
+                    kept_row[k] = _js_add(kept_row.get(k), suffix)
+                to_delete.add(index)
+            elif len(keys) <= 2 and page != kept_page:
+                for k in keys:
+                    kept_row[k] = _js_add(kept_row.get(k), " " + _js_add(row[k], ""))
+                to_delete.add(index)
+
+        if index not in to_delete:
+            kept_row = row
+            kept_page = page
+        previous_keys = keys
+        previous_page = page
+        previous_cut_off = cut_off
+        row["file"] = file_name
+
+    table.rows = [row for index, row in enumerate(table.rows) if index not in to_delete]
+    return table
+
+
+def reformat_headers(columns: List[str]) -> List[str]:
+    """
+    reformatHeaders: take the uuids back out of the income columns' slugs.
+    """
+    headers = []
+    for column in columns:
+        parts = column.split("*")
+        headers.append(parts[0] + (parts[2] if len(parts) > 2 else ""))
+    return headers
+
+
+def table_file(name: str) -> str:
+    """
+    The output file of the tables with this name.
+    """
+    return re.sub(r"[ ,']+", "-", name.lower()).replace('"', "") + ".csv"
+
+
+def extract_file(pdf_path: str) -> Filing:
+    """
+    Parse one disclosure pdf. Its tables are DataFrames of strings (and page
+    numbers), with the columns the parser would have written, so an assets
+    table has two "income" columns.
+    """
+    doc = doc_id(pdf_path)
+    tables = []
+    empty_pages = 0
+    for page_num, items in enumerate(read_text_items(pdf_path), start=1):
+        if len(items) == 0:
+            empty_pages += 1
+        elif parse_page(page_num, items, tables):
+            break
+
+    frames = []
+    for table in tables:
+        table = fix_rows_that_cross_pages(table, doc)
+        if len(table.cols) > 1:
+            slugs = ["file"] + [col.slug for col in table.cols]
+            df = DataFrame(
+                [[row.get(slug) for slug in slugs] for row in table.rows],
+                columns=reformat_headers(slugs),
+                dtype=object,
+            )
+        else:
+            df = None
+        frames.append((table.name, df))
+    return Filing(pdf_path, doc, frames, empty_pages)
+
+
+def write_filing(filing: Filing, out_path: str, headers: set):
+    """
+    Append a parsed pdf to the output files in out_path, as createTables does.
+    Each file's header is only written the first time (the names of the tables
+    already written are kept in headers). A table without rows is written as its
+    header, twice the first time, as reformatHeaders repeats a header that has
+    no lines after it (though without taking the uuids out of the copy).
+    """
+    if filing.empty_pages > 0:
+        with open(os.path.join(out_path, "no-content.csv"), "a") as f:
+            f.write((filing.pdf_path + "\n") * filing.empty_pages)
+    for name, df in filing.tables:
+        with open(os.path.join(out_path, table_file(name)), "a", newline="") as f:
+            if df is None:
+                f.write("{0} - None disclosed\n".format(filing.doc))
+                continue
+            writer = csv.writer(f, lineterminator="\n")
+            if name not in headers:
+                writer.writerow(df.columns)
+                headers.add(name)
+            if len(df) == 0:
+                writer.writerow(df.columns)
+            writer.writerows(df.itertuples(index=False))
+
+
+def extract_folder(file_path: str, out_path: str, workers: int = 1):
+    """
+    Parse the pdfs in file_path with `workers` processes, leaving the same
+    output files in out_path as the TypeScript parser would.
+    """
+    os.makedirs(out_path, exist_ok=True)
+    with open(os.path.join(out_path, "no-content.csv"), "a") as f:
+        f.write("File\n")
+    files = sorted(f for f in os.listdir(file_path) if ".pdf" in f.lower())
+    paths = [os.path.join(file_path, f) for f in files]
+    print("Parsing {0} files with {1} workers...".format(len(paths), workers))
+
+    headers = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # In order, so the output is in the same order as the parser's
+        for filing in pool.map(extract_file, paths, chunksize=16):
+            write_filing(filing, out_path, headers)
+
+
+def rows_by_doc(path: str) -> Dict[str, List[List[str]]]:
+    """
+    The rows of a parser output file (without headers), by DocID.
+    """
+    rows = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) == 0 or row[:2] == ["file", "page"]:
+                continue
+            rows.setdefault(row[0].split(" - None disclosed")[0], []).append(row)
+    return rows
+
+
+def compare_outputs(js_path: str, py_path: str) -> Dict[str, List[str]]:
+    """
+    The DocIDs whose rows differ between two parser output folders, by file.
+    """
+    differences = {}
+    for name in TABLE_FILES:
+        js_rows = rows_by_doc(os.path.join(js_path, name))
+        py_rows = rows_by_doc(os.path.join(py_path, name))
+        differences[name] = sorted(
+            doc
+            for doc in set(js_rows) | set(py_rows)
+            if js_rows.get(doc) != py_rows.get(doc)
+        )
+    return differences
+
+
+def check_against_js(fixture_path: str, workers: int = os.cpu_count()) -> bool:
+    """
+    Parse the pdfs in fixture_path with both parsers and print where they
+    disagree. Returns whether they agreed on everything.
+    """
+    work_path = tempfile.mkdtemp(prefix="pfd_extract_")
+    try:
+        js_path = os.path.join(work_path, "js")
+        py_path = os.path.join(work_path, "py")
+        parse_in_shards(fixture_path, js_path, workers)
+        extract_folder(fixture_path, py_path, workers)
+        differences = compare_outputs(js_path, py_path)
+    finally:
+        shutil.rmtree(work_path)
+
+    for name, docs in differences.items():
+        print(
+            "{0}: {1} documents differ{2}".format(
+                name, len(docs), (": " + ", ".join(docs[:20])) if docs else ""
+            )
+        )
+    return all(len(docs) == 0 for docs in differences.values())
+
+
+if __name__ == "__main__":
+    fixtures = sys.argv[1] if len(sys.argv) > 1 else data_path("pfd/fixtures/")
+    sys.exit(0 if check_against_js(fixtures) else 1)
@@ -0,0 +1,298 @@
+# Runs the whole data pipeline, from downloading the PFDs and processing DIME
+# through to the crosswalk and merged_data.csv. Stages whose code and inputs
+# haven't changed since their last successful run are skipped, and the PFD and
+# DIME sides run side by side in their own processes.
+# Run from this folder, e.g. `python pipeline.py --data-root /big/disk/data`.
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from glob import glob
+from multiprocessing.connection import wait
+from typing import Dict, List
+
+PROCESS_DATA = os.path.dirname(os.path.abspath(__file__))
+DIME = os.path.join(PROCESS_DATA, "dime")
+STATE_FILE = "pipeline_state.json"
+
+
+class Stage:
+    """
+    One step of the pipeline: calls to (module, function, args) made in order
+    from cwd, the source files and data files (globs, relative to the data root)
+    they depend on, the data files they produce, and the stages that have to
+    finish first.
+    """
+
+    def __init__(self, name, cwd, calls, code, inputs, outputs, after=()):
+        self.name = name
+        self.cwd = cwd
+        self.calls = calls
+        self.code = code
+        self.inputs = inputs
+        self.outputs = outputs
+        self.after = list(after)
+
+
+def make_stages(backend: str = "sqlite") -> List[Stage]:
+    return [
+        Stage(
+            "pfd",
+            PROCESS_DATA,
+            [("parse_pfds", "main", ())],
+            [
+                "parse_pfds.py",
+                "downloader.py",
+                "parse_cache.py",
+                "parser_shards.py",
+                "manifest_store.py",
+                "normalize.py",
+                "handoff.py",
+                "house-pfd-parser/src/*.ts",
+            ],
+            [],
+            ["pfd/pfd_final.csv"],
+        ),
+        # These two both modify dime.sqlite3, so they're one stage.
+        Stage(
+            "dime_tables",
+            DIME,
+            [
+                ("process_dime", "merge_and_subset", (backend,)),
+                ("process_dime", "get_first_ninety_days_fundraising", (backend,)),
+                ("process_dime", "extract_features", (backend,)),
+            ],
+            [
+                "dime/process_dime.py",
+                "dime/parquet_store.py",
+                "dime/features.py",
+                "handoff.py",
+            ],
+            [
+                "dime/dime.sqlite3",
+                "dime/donors.sqlite3",
+                "dime/dime_recipients_all_1979_2018.csv",
+            ],
+            ["dime/dime_uncleaned.csv", "dime/campaign_features.csv"],
+        ),
+        Stage(
+            "dime_clean",
+            DIME,
+            [("process_dime", "clean_duplicates", ())],
+            [
+                "dime/process_dime.py",
+                "dime/corrections.py",
+                "dime/corrections.csv",
+                "handoff.py",
+            ],
+            ["dime/dime_uncleaned.csv", "dime/campaign_features.csv"],
+            ["dime_final.csv"],
+            after=["dime_tables"],
+        ),
+        Stage(
+            "primaries",
+            DIME,
+            [("merge_primary_data", "merge_primary_data", ())],
+            ["dime/merge_primary_data.py", "handoff.py"],
+            ["dime_final.csv", "fec/*.xls*"],
+            ["dime_with_primaries.csv"],
+            after=["dime_clean"],
+        ),
+        Stage(
+            "crosswalk",
+            PROCESS_DATA,
+            [("crosswalk", "main", ())],
+            [
+                "crosswalk.py",
+                "manifest_store.py",
+                "name_matching.py",
+                "normalize.py",
+                "handoff.py",
+            ],
+            ["pfd/pfd_final.csv", "dime_with_primaries.csv", "pfd/manifests/*FD.txt"],
+            ["pfd/crosswalk.csv", "merged_data.csv"],
+            after=["pfd", "primaries"],
+        ),
+    ]
+
+
+def fingerprint(stage: Stage, data_root: str) -> str:
+    """
+    Hash of everything a stage's output depends on: what it calls, the contents
+    of its source files and the size and modification time of its inputs.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(stage.calls).encode())
+    for pattern in stage.code:
+        for path in sorted(glob(os.path.join(PROCESS_DATA, pattern))):
+            with open(path, "rb") as f:
+                digest.update(os.path.relpath(path, PROCESS_DATA).encode() + f.read())
+    for pattern in stage.inputs:
+        paths = sorted(glob(os.path.join(data_root, pattern)))
+        digest.update("{0}: {1} files\n".format(pattern, len(paths)).encode())
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(
+                "{0} {1} {2}\n".format(path, stat.st_size, stat.st_mtime_ns).encode()
+            )
+    return digest.hexdigest()
+
+
+def load_state(data_root: str) -> Dict[str, str]:
+    path = os.path.join(data_root, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(data_root: str, state: Dict[str, str]):
+    path = os.path.join(data_root, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def run_stage(stage: Stage, data_root: str):
+    """
+    Run a stage's calls; this is the entry point of the stage's own process.
+    """
+    os.environ["DDRL_DATA_ROOT"] = data_root
+    os.chdir(stage.cwd)
+    sys.path.insert(0, stage.cwd)
+    for module, function, args in stage.calls:
+        getattr(__import__(module), function)(*args)
+
+
+def run_pipeline(
+    stages: List[Stage],
+    data_root: str,
+    force: List[str] = (),
+    jobs: int = 2,
+    dry_run: bool = False,
+) -> bool:
+    """
+    Run every stage that's out of date (or forced) once the stages it comes
+    after are done, up to `jobs` at a time. A stage is up to date if its
+    fingerprint matches the one recorded after its last successful run and all
+    of its outputs exist. Returns whether everything succeeded.
+    """
+    state = load_state(data_root)
+    pending = {stage.name: stage for stage in stages}
+    done = set()
+    running = {}
+    failed = []
+    # spawn, so that stages start from a clean interpreter on every platform
+    context = multiprocessing.get_context("spawn")
+
+    while len(pending) + len(running) > 0:
+        started = False
+        if len(failed) == 0:
+            for name, stage in list(pending.items()):
+                if len(running) >= jobs or not all(s in done for s in stage.after):
+                    continue
+                del pending[name]
+                outputs = [os.path.join(data_root, out) for out in stage.outputs]
+                if (
+                    name not in force
+                    and state.get(name) == fingerprint(stage, data_root)
+                    and all(os.path.exists(out) for out in outputs)
+                ):
+                    print("[{0}] up to date, skipping".format(name))
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print("[{0}] would run".format(name))
+                    done.add(name)
+                    continue
+                print("[{0}] running...".format(name))
+                process = context.Process(
+                    target=run_stage, args=(stage, data_root), name=name
+                )
+                process.start()
+                running[process.sentinel] = (process, stage, time.time())
+                started = True
+        if len(running) == 0:
+            if len(failed) > 0 or not started and len(pending) > 0:
+                break
+            # Only skips so far, which may have unblocked other stages
+            continue
+        for sentinel in wait(list(running)):
+            process, stage, start = running.pop(sentinel)
+            process.join()
+            if process.exitcode != 0:
+                print(
+                    "[{0}] FAILED (exit code {1})".format(stage.name, process.exitcode)
+                )
+                failed.append(stage.name)
+                continue
+            print("[{0}] done in {1:.1f}s".format(stage.name, time.time() - start))
+            # Recorded after the run, since some stages modify their inputs.
+            state[stage.name] = fingerprint(stage, data_root)
+            save_state(data_root, state)
+            done.add(stage.name)
+
+    if len(failed) > 0:
+        print("Failed:", ", ".join(failed), "; not run:", ", ".join(pending) or "-")
+    return len(failed) == 0
+
+
+if __name__ == "__main__":
+    stage_names = [stage.name for stage in make_stages()]
+    parser = argparse.ArgumentParser(description="Run the data pipeline.")
+    parser.add_argument(
+        "--data-root",
+        default=os.environ.get(
+            "DDRL_DATA_ROOT", os.path.join(PROCESS_DATA, "..", "data")
+        ),
+        help="Where all the data goes (default: the top-level data folder)",
+    )
+    parser.add_argument(
+        "--force",
+        nargs="*",
+        choices=stage_names,
+        help="Rerun these stages even if they're up to date (all of them if none "
+        "are named)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["sqlite", "parquet"],
+        default="sqlite",
+        help="Where the DIME contributions are read from",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=2, help="How many stages to run at once"
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use the FEC workbooks already downloaded to the data root",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "pyinstrument"],
+        help="Profile the stage functions too (see instrument.py)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print which stages would run",
+    )
+    args = parser.parse_args()
+
+    data_root = os.path.abspath(args.data_root)
+    if args.offline:
+        # Inherited by the stages' processes
+        os.environ["DDRL_OFFLINE"] = "1"
+    if args.profile is not None:
+        os.environ["DDRL_PROFILE"] = args.profile
+    # Have the stages report how long they took, unless told to report elsewhere
+    os.environ.setdefault("DDRL_REPORTS", os.path.join(data_root, "reports"))
+    force = stage_names if args.force == [] else args.force or []
+    ok = run_pipeline(
+        make_stages(args.backend), data_root, force, args.jobs, args.dry_run
+    )
+    sys.exit(0 if ok else 1)